@@ -1,6 +1,7 @@
 """
 pcr_analyzer.py - Esteso con analisi OI e fragilità sistemica
 """
+from data.option_chain import OptionChain
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -10,6 +11,12 @@ class PCRAnalyzer:
         self.volume_data = volume_data
         self.oi_data = oi_data
     
+    @classmethod
+    def from_chain(cls, chain):
+        """Crea l'analizzatore da una OptionChain (o dict legacy)"""
+        chain = OptionChain.coerce(chain)
+        return cls(volume_data=chain.volume_data, oi_data=chain.oi_data)
+    
     def calculate_all_pcr(self):
         """
         Calcola tutti i PCR richiesti
@@ -0,0 +1,223 @@
+"""
+sentiment_index.py - Indice sentiment per ticker con decadimento esponenziale nel tempo
+"""
+import math
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Union
+import logging
+
+from utils.helpers import get_asset_universe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HALF_LIFE = 3600.0     # secondi: un messaggio di un'ora fa pesa la metà
+DEFAULT_PRIORITY_WEIGHTS = {1: 1.0, 2: 0.5}   # priority 1 = fonte più autorevole
+MARKET_KEY = '*'               # indice aggregato di tutti i messaggi
+
+Timestamp = Union[float, datetime, None]
+
+
+def _to_epoch(timestamp: Timestamp) -> float:
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+def published_epoch(item: Dict) -> Optional[float]:
+    """
+    Istante di pubblicazione di un elemento (RSS 'published' in RFC 822,
+    'published_date' o 'timestamp' ISO); None se assente o non leggibile.
+    Date nel futuro (orologi sfasati) vengono riportate ad adesso
+    """
+    for field in ('published', 'published_date', 'timestamp'):
+        value = item.get(field)
+        if not value:
+            continue
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            try:
+                parsed = parsedate_to_datetime(str(value))
+            except (TypeError, ValueError, IndexError):
+                try:
+                    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+                except ValueError:
+                    continue
+        return min(parsed.timestamp(), time.time())
+    return None
+
+
+class SentimentIndex:
+    """
+    Media pesata del final_score per ticker, con peso derivato dal rango della
+    fonte (priority 1 = più autorevole, come in config.yaml) e decadimento
+    esponenziale (half_life). Per ogni ticker si tengono solo somma pesata,
+    peso totale e istante dell'ultimo aggiornamento: ogni messaggio costa O(1)
+    e le query al tempo t non riscandiscono lo storico.
+    """
+
+    def __init__(self, half_life: float = DEFAULT_HALF_LIFE, universe: Optional[Iterable[str]] = None,
+                 min_weight: float = 0.0, priority_weights: Optional[Dict[int, float]] = None):
+        self.half_life = float(half_life)
+        self.universe = {t.upper() for t in universe} if universe else None
+        self.min_weight = min_weight
+        weights = DEFAULT_PRIORITY_WEIGHTS if priority_weights is None else priority_weights
+        self.priority_weights = {int(rank): float(weight) for rank, weight in weights.items()}
+        self._decay_rate = math.log(2) / self.half_life
+        # ticker -> [somma pesata, peso, ultimo aggiornamento (epoch), messaggi]
+        self._state: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None):
+        config = config or {}
+        index_config = config.get('analysis', {}).get('sentiment', {}).get('index', {}) or {}
+        universe = index_config.get('universe')
+        if universe is None:
+            universe = get_asset_universe(config)
+        return cls(
+            half_life=index_config.get('half_life', DEFAULT_HALF_LIFE),
+            universe=[t for t in universe if t] if universe else None,
+            min_weight=index_config.get('min_weight', 0.0),
+            priority_weights=index_config.get('priority_weights')
+        )
+
+    def priority_weight(self, priority) -> float:
+        """Peso di una fonte dal suo rango: dalla mappa priority_weights, altrimenti 1 / priority"""
+        try:
+            rank = float(priority or 1)
+        except (TypeError, ValueError):
+            rank = 1.0
+        if rank.is_integer() and int(rank) in self.priority_weights:
+            return self.priority_weights[int(rank)]
+        return 1.0 / rank if rank > 0 else 0.0
+
+    def _decay(self, seconds: float) -> float:
+        return math.exp(-self._decay_rate * seconds)
+
+    def _update_key(self, key: str, weighted: float, weight: float, now: float):
+        state = self._state.get(key)
+        if state is None:
+            self._state[key] = [weighted, weight, now, 1]
+            return
+
+        elapsed = now - state[2]
+        if elapsed >= 0:
+            factor = self._decay(elapsed)
+            state[0] = state[0] * factor + weighted
+            state[1] = state[1] * factor + weight
+            state[2] = now
+        else:
+            # Messaggio arrivato in ritardo: pesa come se fosse già decaduto
+            factor = self._decay(-elapsed)
+            state[0] += weighted * factor
+            state[1] += weight * factor
+        state[3] += 1
+
+    def update(self, score: float, tickers: Iterable[str], priority: float = 1,
+               timestamp: Timestamp = None) -> List[str]:
+        """Aggiunge un messaggio all'indice; restituisce i ticker aggiornati"""
+        weight = self.priority_weight(priority)
+        if weight <= 0 or score is None:
+            return []
+        now = _to_epoch(timestamp)
+        weighted = weight * float(score)
+
+        keys = []
+        for ticker in tickers or []:
+            ticker = ticker.upper()
+            if (self.universe is None or ticker in self.universe) and ticker not in keys:
+                keys.append(ticker)
+
+        with self._lock:
+            self._update_key(MARKET_KEY, weighted, weight, now)
+            for key in keys:
+                self._update_key(key, weighted, weight, now)
+        return keys
+
+    def update_many(self, items: Iterable[Dict], timestamp: Timestamp = None) -> int:
+        """
+        Aggiorna con elementi analizzati (con 'sentiment' da SentimentAnalyzer
+        e 'priority' della fonte), come quelli di SentimentIngestor.
+        Ogni messaggio pesa dall'istante di pubblicazione; senza una data
+        leggibile vale l'istante dell'analisi (o timestamp, se indicato)
+        """
+        count = 0
+        for item in items:
+            sentiment = item.get('sentiment', item)
+            published = published_epoch(item)
+            if published is None:
+                published = timestamp if timestamp is not None else sentiment.get('timestamp')
+            self.update(
+                sentiment.get('final_score'),
+                sentiment.get('tickers_mentioned', []),
+                priority=item.get('priority', 1),
+                timestamp=published
+            )
+            count += 1
+        return count
+
+    def get(self, ticker: str = MARKET_KEY, at: Timestamp = None) -> Dict:
+        """
+        Indice al tempo at (default: adesso). final_score è la media pesata
+        decaduta; weight è il peso residuo (quanto è recente e fitta la copertura).
+        Istanti precedenti all'ultimo aggiornamento restituiscono lo stato corrente
+        """
+        key = ticker.upper()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                return {'ticker': key, 'final_score': 0.0, 'weight': 0.0, 'messages': 0, 'last_update': None}
+            weighted, weight, last, messages = state
+
+        factor = self._decay(max(_to_epoch(at) - last, 0.0))
+        weight *= factor
+        score = weighted * factor / weight if weight > 0 else 0.0
+        if weight < self.min_weight:
+            score = 0.0
+        return {
+            'ticker': key,
+            'final_score': score,
+            'weight': weight,
+            'messages': int(messages),
+            'last_update': datetime.fromtimestamp(last)
+        }
+
+    def snapshot(self, at: Timestamp = None) -> Dict[str, Dict]:
+        """Indice di tutti i ticker al tempo at"""
+        with self._lock:
+            keys = list(self._state)
+        return {key: self.get(key, at) for key in keys}
+
+    def prune(self, min_weight: float = 1e-3, at: Timestamp = None) -> int:
+        """Rimuove i ticker il cui peso residuo è trascurabile"""
+        now = _to_epoch(at)
+        with self._lock:
+            stale = [key for key, state in self._state.items()
+                     if state[1] * self._decay(max(now - state[2], 0.0)) < min_weight]
+            for key in stale:
+                del self._state[key]
+        return len(stale)
+
+
+if __name__ == "__main__":
+    index = SentimentIndex(half_life=600, universe=['SPY', 'QQQ', 'NVDA'])
+    start = time.time() - 3600
+    for minute in range(60):
+        index.update(0.6, ['SPY', 'NVDA'], priority=2, timestamp=start + minute * 60)
+        index.update(-0.4 if minute > 40 else 0.2, ['QQQ', 'SPY'], priority=1, timestamp=start + minute * 60)
+
+    for ticker in ('SPY', 'QQQ', 'NVDA', MARKET_KEY):
+        print(index.get(ticker))
+    print(f"SPY fra 30 minuti: {index.get('SPY', at=time.time() + 1800)}")
+
+    messages = 200000
+    begin = time.perf_counter()
+    for i in range(messages):
+        index.update(0.1, ['SPY', 'QQQ'], timestamp=start + i * 0.01)
+    print(f"update: {(time.perf_counter() - begin) / messages * 1e6:.2f} µs/messaggio")
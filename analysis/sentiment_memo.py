@@ -0,0 +1,111 @@
+"""
+sentiment_memo.py - Memoizzazione dei punteggi sentiment per hash del testo normalizzato
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from utils.cache import TTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMO_ENTRIES = 50000
+DEFAULT_MEMO_DB = "options_data.db"   # stesso database di sentiment_data
+
+
+def text_hash(cleaned_text: str) -> str:
+    return hashlib.blake2b(cleaned_text.encode(), digest_size=16).hexdigest()
+
+
+class SentimentMemo:
+    """
+    LRU dei punteggi per hash del testo normalizzato: repost, citazioni e
+    summary ripetuti costano una lookup. Con db_path i punteggi vengono
+    anche salvati nella tabella sentiment_memo e sopravvivono ai riavvii.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MEMO_ENTRIES, db_path: Optional[str] = None):
+        self.cache = TTLCache(max_size=max_entries, ttl=0)
+        self.db_path = db_path
+        self.persisted_hits = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sentiment_memo (
+                    text_hash TEXT PRIMARY KEY,
+                    result_json TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None):
+        memo_config = (config or {}).get('analysis', {}).get('sentiment', {}).get('memo', {}) or {}
+        if not memo_config.get('enabled', True):
+            return None
+        return cls(
+            max_entries=memo_config.get('max_entries', DEFAULT_MEMO_ENTRIES),
+            db_path=memo_config.get('db_path', DEFAULT_MEMO_DB) if memo_config.get('persist', False) else None
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        result = self.cache.get(key)
+        if result is not None or self._conn is None:
+            return result
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result_json FROM sentiment_memo WHERE text_hash = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        result = json.loads(row[0])
+        self.persisted_hits += 1
+        self.cache.set(key, result)
+        return result
+
+    def set_many(self, results: Dict[str, Dict]):
+        """Memorizza più punteggi (un solo commit sul database)"""
+        for key, result in results.items():
+            self.cache.set(key, result)
+
+        if self._conn is None or not results:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO sentiment_memo VALUES (?, ?, ?)',
+                [(key, json.dumps(result), now) for key, result in results.items()]
+            )
+            self._conn.commit()
+
+    def set(self, key: str, result: Dict):
+        self.set_many({key: result})
+
+    def get_stats(self) -> Dict:
+        """Hit ratio della memo (gli hit da database contano come hit)"""
+        stats = self.cache.get_stats()
+        hits = stats['hits'] + self.persisted_hits
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'size': stats['size'],
+            'max_size': stats['max_size'],
+            'hits': hits,
+            'misses': lookups - hits,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'persisted_hits': self.persisted_hits,
+            'evictions': stats['evictions']
+        }
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
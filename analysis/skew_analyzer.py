@@ -3,13 +3,16 @@ skew_analyzer.py - Esteso con le nuove funzionalità richieste
 """
 import numpy as np
 from datetime import datetime, timedelta
+from data.option_chain import OptionChain, nearest_by_abs_delta
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 class SkewAnalyzer:
     def __init__(self, options_data):
+        # Accetta sia OptionChain sia il dict legacy
         self.options_data = options_data
+        self.chain = OptionChain.coerce(options_data)
         
     def calculate_25delta_skew(self):
         """
@@ -68,14 +71,12 @@ class SkewAnalyzer:
     
     def _get_option_iv(self, delta, option_type):
         """
-        Estrae IV per un dato delta e tipo di opzione
+        Estrae IV per un dato delta (in valore assoluto) e tipo di opzione
         """
-        # Implementazione semplificata - adatta ai tuoi dati
-        options = self.options_data.get(option_type, [])
-        for opt in options:
-            if abs(opt.get('delta', 0) - delta) < 0.05:  # Tolleranza ±5%
-                return opt.get('implied_volatility', 0)
-        return 0
+        option = nearest_by_abs_delta(self.chain.side(option_type), delta)  # Tolleranza ±5%
+        if option is None:
+            return 0
+        return float(option['implied_volatility'])
     
     def generate_option_walls(self, min_oi_threshold=1000):
         """
@@ -84,46 +85,52 @@ class SkewAnalyzer:
         walls = {
             'calls': [],
             'puts': [],
-            'spot_price': self.options_data.get('spot_price', 0),
+            'spot_price': self.chain.spot_price,
             'max_pain': 0
         }
         
-        # Trova strike con massimo OI per call
-        calls = self.options_data.get('calls', [])
-        if calls:
-            max_oi_call = max(calls, key=lambda x: x.get('open_interest', 0))
-            if max_oi_call.get('open_interest', 0) > min_oi_threshold:
-                distance = ((max_oi_call['strike'] - walls['spot_price']) / walls['spot_price']) * 100
-                walls['calls'].append({
-                    'strike': max_oi_call['strike'],
-                    'open_interest': max_oi_call['open_interest'],
+        # Trova strike con massimo OI per call e per put
+        for key in ('calls', 'puts'):
+            side = self.chain.side(key)
+            if side.empty:
+                continue
+            wall = side.loc[side['open_interest'].idxmax()]
+            if wall['open_interest'] > min_oi_threshold:
+                distance = float((wall['strike'] - walls['spot_price']) / walls['spot_price'] * 100)
+                walls[key].append({
+                    'strike': float(wall['strike']),
+                    'open_interest': int(wall['open_interest']),
                     'distance_percent': distance,
-                    'distance_points': max_oi_call['strike'] - walls['spot_price']
-                })
-        
-        # Trova strike con massimo OI per put
-        puts = self.options_data.get('puts', [])
-        if puts:
-            max_oi_put = max(puts, key=lambda x: x.get('open_interest', 0))
-            if max_oi_put.get('open_interest', 0) > min_oi_threshold:
-                distance = ((max_oi_put['strike'] - walls['spot_price']) / walls['spot_price']) * 100
-                walls['puts'].append({
-                    'strike': max_oi_put['strike'],
-                    'open_interest': max_oi_put['open_interest'],
-                    'distance_percent': distance,
-                    'distance_points': max_oi_put['strike'] - walls['spot_price']
+                    'distance_points': float(wall['strike']) - walls['spot_price']
                 })
         
         # Calcola max pain (semplificato)
-        if calls and puts:
-            all_strikes = set([c['strike'] for c in calls] + [p['strike'] for p in puts])
-            pain_points = []
-            for strike in all_strikes:
-                pain = sum([c['open_interest'] for c in calls if c['strike'] < strike]) + \
-                       sum([p['open_interest'] for p in puts if p['strike'] > strike])
-                pain_points.append((strike, pain))
-            
-            if pain_points:
-                walls['max_pain'] = min(pain_points, key=lambda x: x[1])[0]
+        walls['max_pain'] = self._calculate_max_pain()
         
         return walls
+    
+    def _calculate_max_pain(self):
+        """
+        Max pain semplificato: strike che minimizza OI call sotto lo strike
+        più OI put sopra lo strike (somme cumulative su strike ordinati)
+        """
+        calls, puts = self.chain.calls, self.chain.puts
+        if calls.empty or puts.empty:
+            return 0
+        
+        strikes = np.union1d(calls['strike'].to_numpy(), puts['strike'].to_numpy())
+        
+        call_order = np.argsort(calls['strike'].to_numpy(), kind='stable')
+        call_strikes = calls['strike'].to_numpy()[call_order]
+        call_cum = np.concatenate(([0.0], np.cumsum(calls['open_interest'].to_numpy()[call_order])))
+        
+        put_order = np.argsort(puts['strike'].to_numpy(), kind='stable')
+        put_strikes = puts['strike'].to_numpy()[put_order]
+        put_cum = np.concatenate(([0.0], np.cumsum(puts['open_interest'].to_numpy()[put_order])))
+        
+        # OI call con strike < K e OI put con strike > K
+        calls_below = call_cum[np.searchsorted(call_strikes, strikes, side='left')]
+        puts_above = put_cum[-1] - put_cum[np.searchsorted(put_strikes, strikes, side='right')]
+        
+        pain = calls_below + puts_above
+        return float(strikes[int(np.argmin(pain))])
@@ -0,0 +1,186 @@
+"""
+ticker_extractor.py - Estrazione ticker con automa Aho-Corasick su un universo di simboli noto
+"""
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from utils.helpers import get_asset_universe
+
+logger = logging.getLogger(__name__)
+
+# Parole con eventuale cashtag, incluse forme come S&P, BRK.B, NASDAQ-100
+TOKEN_PATTERN = re.compile(r"(\$?)(\w+(?:[&.\-']\w+)*)")
+
+# Nomi comuni per i ticker dell'universo di default (multi-parola ammessi)
+DEFAULT_ALIASES = {
+    'SPY': ['s&p 500', 's&p500', 'sp500', 'spx'],
+    'QQQ': ['nasdaq', 'nasdaq 100', 'nasdaq-100', 'ndx'],
+    'IWM': ['russell 2000', 'russell'],
+    'DIA': ['dow jones', 'dow'],
+    'AAPL': ['apple'],
+    'MSFT': ['microsoft'],
+    'TSLA': ['tesla'],
+    'NVDA': ['nvidia'],
+    'AMZN': ['amazon'],
+    'GOOGL': ['alphabet', 'google'],
+    'META': ['facebook'],
+}
+
+SYMBOL = 'symbol'
+ALIAS = 'alias'
+
+
+def load_symbols_file(path: str) -> Dict[str, List[str]]:
+    """
+    File simboli: una riga per ticker, "TICKER" oppure "TICKER: alias1, alias2".
+    Righe vuote e commenti (#) ignorati
+    """
+    symbols = {}
+    for line in Path(path).read_text(encoding='utf-8').splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        ticker, _, aliases = line.partition(':')
+        symbols.setdefault(ticker.strip().upper(), []).extend(
+            alias.strip() for alias in aliases.split(',') if alias.strip()
+        )
+    return symbols
+
+
+class TickerExtractor:
+    """
+    Automa Aho-Corasick costruito una volta sull'universo di simboli e alias.
+    L'alfabeto sono le parole del messaggio (non i caratteri): i confini di
+    parola sono garantiti, gli alias multi-parola ("dow jones") funzionano e
+    l'estrazione è lineare nel numero di parole, qualunque sia l'universo.
+
+    Un simbolo conta se scritto come cashtag ($spy) o in maiuscolo (SPY);
+    i simboli di una lettera solo come cashtag. Gli alias valgono in
+    qualunque forma. Così "come", "per", "USA" non diventano ticker.
+    """
+
+    def __init__(self, symbols: Dict[str, Iterable[str]]):
+        # Stato 0 = radice; per ogni stato: transizioni, failure link, output
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        self.symbols = sorted({ticker.upper() for ticker in symbols})
+
+        for ticker, aliases in symbols.items():
+            ticker = ticker.upper()
+            self._add_pattern([ticker.lower()], ticker, SYMBOL)
+            for alias in aliases or []:
+                words = [word for _, word in TOKEN_PATTERN.findall(alias.lower())]
+                if words:
+                    self._add_pattern(words, ticker, ALIAS)
+        self._build_failure_links()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None):
+        """Universo = assets del config (o DEFAULT_ALIASES) + file simboli opzionale + alias da config"""
+        config = config or {}
+        tickers_config = config.get('analysis', {}).get('sentiment', {}).get('tickers', {}) or {}
+
+        universe = get_asset_universe(config) or list(DEFAULT_ALIASES)
+        symbols = {ticker: list(DEFAULT_ALIASES.get(ticker, [])) for ticker in universe}
+        symbols_file = tickers_config.get('symbols_file')
+        if symbols_file:
+            try:
+                for ticker, aliases in load_symbols_file(symbols_file).items():
+                    symbols.setdefault(ticker, list(DEFAULT_ALIASES.get(ticker, []))).extend(aliases)
+            except OSError as e:
+                logger.warning(f"⚠️ File simboli {symbols_file} non leggibile: {e}")
+        for ticker, aliases in (tickers_config.get('aliases') or {}).items():
+            symbols.setdefault(ticker.upper(), []).extend(aliases)
+        return cls(symbols)
+
+    def _add_pattern(self, words: List[str], ticker: str, kind: str):
+        state = 0
+        for word in words:
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][word] = next_state
+            state = next_state
+        self._output[state].append((ticker, kind))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def extract(self, text: str) -> List[str]:
+        """Ticker dell'universo citati nel testo, in ordine di prima comparsa"""
+        if not text:
+            return []
+
+        goto, fail, output = self._goto, self._fail, self._output
+        root = goto[0]
+        found = []
+        state = 0
+        for cashtag, word in TOKEN_PATTERN.findall(text):
+            key = word.lower()
+            if not state and key not in root:
+                continue  # caso più frequente: parola fuori dall'universo
+            while state and key not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(key, 0)
+            for ticker, kind in output[state]:
+                if ticker in found:
+                    continue
+                if kind == ALIAS or cashtag or (len(word) > 1 and word.isupper()):
+                    found.append(ticker)
+        return found
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from utils.helpers import load_config
+
+    extractor = TickerExtractor.from_config(load_config())
+    print(f"Universo: {extractor.symbols}")
+    for message in [
+        "Oggi SPY sopra 480, $qqq in ritardo: come sempre dipende dalla Fed",
+        "Apple e Nvidia trascinano il Nasdaq 100, il Dow Jones resta piatto",
+        "per me è tutto USA e CPI, occhio a TSLA",
+    ]:
+        print(f"{extractor.extract(message)} <- {message}")
+
+    # Corpus grande: universo di 5.000 simboli sintetici + messaggi misti IT/EN
+    rng = random.Random(0)
+    universe = {''.join(rng.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=rng.randint(2, 5))): [] for _ in range(5000)}
+    universe.update(DEFAULT_ALIASES)
+    words = ("oggi il mercato apre in rialzo come previsto per la fed e la BCE ma occhio al CPI "
+             "market rally continues while traders buy calls and sell puts into earnings").split()
+    names = list(universe)
+    corpus = [
+        ' '.join(rng.choice(words) for _ in range(20)) + f" ${rng.choice(names)} {rng.choice(names)} apple"
+        for _ in range(50000)
+    ]
+
+    big = TickerExtractor(universe)
+    legacy = re.compile(r'\b[A-Z]{1,5}\b')
+    for label, func in (('regex (prima)', lambda m: list(dict.fromkeys(legacy.findall(m.upper())))),
+                        ('Aho-Corasick', big.extract)):
+        start = time.perf_counter()
+        mentioned = sum(len(func(message)) for message in corpus)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<14} {elapsed / len(corpus) * 1e6:6.1f} µs/messaggio, "
+              f"{mentioned / len(corpus):5.1f} ticker/messaggio")
@@ -6,12 +6,28 @@ class VolatilityAnalyzer:
         self.vix_data = vix_data
         self.historical_vol = historical_vol
     
+    @property
+    def vix_available(self):
+        """False se il fetcher ha marcato il VIX come non disponibile"""
+        return bool(self.vix_data) and self.vix_data.get('available', True)
+    
     def analyze_volatility_regime(self, market_return):
         """
         Analizza comportamento volatilità durante movimenti di mercato
         
         TUO punto: "Volatilità se mercato scende davvero la volatilità esplode"
         """
+        if not self.vix_available:
+            return {
+                'regime': "UNAVAILABLE",
+                'vix_current': None,
+                'vix_change': None,
+                'market_return': market_return,
+                'message': f"⚪ VIX non disponibile: {self.vix_data.get('error', 'dati assenti')}",
+                'is_volatility_spiking': False,
+                'vix_available': False
+            }
+        
         vix_current = self.vix_data.get('current', 0)
         vix_previous = self.vix_data.get('previous', 0)
         vix_change = vix_current - vix_previous
@@ -52,11 +68,20 @@ class VolatilityAnalyzer:
             'vix_change': vix_change,
             'market_return': market_return,
             'message': message,
-            'is_volatility_spiking': vix_change > 2.0 and market_return < -0.5
+            'is_volatility_spiking': vix_change > 2.0 and market_return < -0.5,
+            'vix_available': True
         }
     
     def get_volatility_metrics(self):
         """Metriche complete volatilità"""
+        if not self.vix_available:
+            return {
+                'vix': None,
+                'vix_1d_change': None,
+                'vix_1w_change': None,
+                'term_structure': self._analyze_term_structure(),
+                'volatility_regime': "UNAVAILABLE"
+            }
         return {
             'vix': self.vix_data.get('current', 0),
             'vix_1d_change': self.vix_data.get('current', 0) - self.vix_data.get('previous', 0),
@@ -14,12 +14,22 @@ try:
     from analysis.skew_analyzer import SkewAnalyzer
     from analysis.pcr_analyzer import PCRAnalyzer
     from analysis.volatility_analyzer import VolatilityAnalyzer
-    from data.options_fetcher import OptionsFetcher, fetch_options_snapshot
+    from data.options_fetcher import OptionsFetcher, fetch_options_snapshot, get_quote_cache_stats
+    from data.option_chain import OptionChain
+    from utils.helpers import load_config
     MODULES_LOADED = True
 except ImportError as e:
     st.warning(f"Alcuni moduli non trovati: {e}")
     MODULES_LOADED = False
 
+@st.cache_resource
+def get_fetcher(ticker):
+    """
+    Un OptionsFetcher per ticker, condiviso tra i rerun di Streamlit: il diff
+    tra snapshot e gli aggregati incrementali sopravvivono agli aggiornamenti
+    """
+    return OptionsFetcher.from_config(ticker, load_config())
+
 def main():
     st.set_page_config(
         page_title="Options Sentiment Dashboard",
@@ -51,9 +61,8 @@ def main():
         else:
             # Prova a fetch dati reali
             try:
-                fetcher = OptionsFetcher(ticker)
-                options_data = fetcher.fetch_options_data(expiration)
-                st.session_state.options_data = options_data
+                fetcher = get_fetcher(ticker)
+                st.session_state.options_data = fetcher.fetch_chain(expiration)
                 st.success("✅ Dati caricati con successo")
             except Exception as e:
                 st.error(f"❌ Errore fetch dati: {e}")
@@ -68,23 +77,23 @@ def main():
         st.json(options_data)
         return
     
+    # Vista colonnare unica per tutti gli analizzatori (mock dict o OptionChain)
+    chain = OptionChain.coerce(options_data)
+    
     # Inizializza analizzatori
     try:
-        skew_analyzer = SkewAnalyzer(options_data)
-        pcr_analyzer = PCRAnalyzer(
-            volume_data=options_data.get('volume_data', {}),
-            oi_data=options_data.get('oi_data', {})
-        )
+        skew_analyzer = SkewAnalyzer(chain)
+        pcr_analyzer = PCRAnalyzer.from_chain(chain)
         vol_analyzer = VolatilityAnalyzer(
-            vix_data=options_data.get('vix_data', {}),
-            historical_vol=options_data.get('historical_vol', {})
+            vix_data=chain.vix_data,
+            historical_vol={}
         )
         
         # Calcoli
         skew_data = skew_analyzer.calculate_25delta_skew() or {}
         pcr_data = pcr_analyzer.calculate_all_pcr() or {}
         vol_data = vol_analyzer.analyze_volatility_regime(
-            market_return=options_data.get('market_return', 0)
+            market_return=chain.market_return
         ) or {}
         walls_data = skew_analyzer.generate_option_walls() or {}
         
@@ -96,10 +105,12 @@ def main():
     except Exception as e:
         st.error(f"❌ Errore nell'analisi: {e}")
         # Fallback a dati mock per visualizzazione
-        skew_data, pcr_data, vol_data, walls_data = get_mock_analysis_data(options_data)
+        skew_data, pcr_data, vol_data, walls_data = get_mock_analysis_data(chain.to_dict())
     
     # SEZIONE 1: Matrice indicatori
     st.header("1️⃣ Indicatori di Sentiment")
+    if chain.vix_data.get('available') is False:
+        st.warning(f"⚠️ VIX non disponibile: {chain.vix_data.get('error', '')}")
     render_sentiment_matrix(skew_data, pcr_data, vol_data)
     
     # SEZIONE 2: Muro opzioni
@@ -119,11 +130,12 @@ def main():
     with st.expander("🔍 Debug Info"):
         st.write("**Dati caricati:**")
         st.json({
-            'ticker': options_data.get('ticker'),
-            'spot': options_data.get('spot_price'),
-            'calls_count': len(options_data.get('calls', [])),
-            'puts_count': len(options_data.get('puts', [])),
-            'market_return': options_data.get('market_return')
+            'ticker': chain.ticker,
+            'spot': chain.spot_price,
+            'calls_count': len(chain.calls),
+            'puts_count': len(chain.puts),
+            'market_return': chain.market_return,
+            'quote_cache': get_quote_cache_stats()
         })
 
 def get_mock_data():
@@ -44,12 +44,16 @@ def render_sentiment_matrix(skew_data, pcr_data, vol_data):
     with col4:
         vix = vol_data.get('vix_current', 0)
         vix_change = vol_data.get('vix_change', 0)
-        st.metric(
-            label="VIX",
-            value=f"{vix:.1f}",
-            delta=f"{vix_change:+.1f}",
-            help="Indice volatilità"
-        )
+        if vix is None:
+            # VIX non disponibile: nessun valore mostrato come dato di mercato
+            st.metric(label="VIX", value="n/d", help="Indice volatilità")
+        else:
+            st.metric(
+                label="VIX",
+                value=f"{vix:.1f}",
+                delta=f"{vix_change:+.1f}",
+                help="Indice volatilità"
+            )
         st.caption(vol_data.get('message', ''))
 
 def render_option_walls(walls_data):
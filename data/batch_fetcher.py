@@ -0,0 +1,137 @@
+"""
+batch_fetcher.py - Ingestion batch delle catene opzioni per tutto l'universo asset
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from data.options_fetcher import OptionsFetcher, get_vix_context
+from data.providers import create_provider
+from utils.helpers import get_asset_universe
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Ticker scaricati in parallelo per ciclo
+DEFAULT_BATCH_WORKERS = 4
+
+
+class MarketFrame:
+    """
+    Fotografia coerente del mercato per un ciclo di ingestion: una catena (o
+    superficie) per ticker, VIX condiviso e un unico timestamp di ciclo
+    """
+
+    def __init__(self, timestamp, vix_data, chains, timings, cycle_time, errors=None):
+        self.timestamp = timestamp
+        self.vix_data = vix_data
+        self.chains = chains
+        self.timings = timings
+        self.cycle_time = cycle_time
+        self.errors = errors or {}
+
+    @property
+    def vix_available(self):
+        return bool(self.vix_data.get('available', True))
+
+    @property
+    def tickers(self):
+        return list(self.chains)
+
+    def __getitem__(self, ticker):
+        return self.chains[ticker]
+
+    def __contains__(self, ticker):
+        return ticker in self.chains
+
+    def __len__(self):
+        return len(self.chains)
+
+    def get_timing_report(self):
+        """Tempi di fetch per ticker e per l'intero ciclo (secondi)"""
+        return {
+            'timestamp': self.timestamp,
+            'cycle_time': round(self.cycle_time, 3),
+            'vix_available': self.vix_available,
+            'tickers': {ticker: round(elapsed, 3) for ticker, elapsed in self.timings.items()},
+            'errors': dict(self.errors)
+        }
+
+
+class BatchOptionsFetcher:
+    """Fetch concorrente delle catene opzioni per una lista di ticker"""
+
+    def __init__(self, config=None, max_workers=None, full_surface=False, provider=None, writer=None):
+        self.config = config or {}
+        # Un solo provider per tutti i ticker (yfinance, registrazione o replay)
+        self.provider = provider or create_provider(self.config)
+        options_config = self.config.get('data_sources', {}).get('options', {})
+        self.max_workers = max_workers or options_config.get('max_workers', DEFAULT_BATCH_WORKERS)
+        self.full_surface = full_surface
+        # WriteBehindWriter opzionale: ogni catena scaricata viene accodata per il salvataggio
+        self.writer = writer
+        self._fetchers = {}
+
+    def get_fetcher(self, ticker):
+        """Fetcher per ticker, riutilizzato tra i cicli"""
+        if ticker not in self._fetchers:
+            self._fetchers[ticker] = OptionsFetcher.from_config(ticker, self.config, provider=self.provider)
+        return self._fetchers[ticker]
+
+    def fetch_universe(self, tickers=None):
+        """
+        Scarica le catene di tutti i ticker (default: universo asset di
+        config.yaml) con concorrenza limitata. Il VIX viene scaricato una
+        sola volta per ciclo e tutte le catene portano lo stesso timestamp;
+        se non è disponibile le catene lo riportano come tale (vix_available).
+        """
+        tickers = tickers or get_asset_universe(self.config)
+        cycle_start = time.perf_counter()
+        timestamp = datetime.now().isoformat()
+
+        logger.info(f"Ciclo batch per {len(tickers)} ticker")
+        vix_data = get_vix_context(self.provider)
+
+        chains = {}
+        timings = {}
+        errors = {}
+        workers = max(1, min(self.max_workers, len(tickers)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-fetch") as executor:
+            futures = {
+                executor.submit(self._fetch_ticker, ticker, vix_data, timestamp): ticker
+                for ticker in tickers
+            }
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    chains[ticker], timings[ticker] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ Errore batch fetch {ticker}: {e}")
+                    errors[ticker] = str(e)
+                    continue
+                if self.writer is not None:
+                    self.writer.submit(ticker, chains[ticker])
+
+        # Ordine del ciclo coerente con la lista richiesta
+        chains = {ticker: chains[ticker] for ticker in tickers if ticker in chains}
+        cycle_time = time.perf_counter() - cycle_start
+
+        logger.info(f"✅ Ciclo batch completato: {len(chains)}/{len(tickers)} ticker in {cycle_time:.2f}s"
+                    f"{'' if vix_data.get('available', True) else ' (VIX non disponibile)'}")
+        return MarketFrame(timestamp, vix_data, chains, timings, cycle_time, errors)
+
+    def _fetch_ticker(self, ticker, vix_data, timestamp):
+        start = time.perf_counter()
+        fetcher = self.get_fetcher(ticker)
+        if self.full_surface:
+            result = fetcher.fetch_surface(vix_data=vix_data, timestamp=timestamp)
+        else:
+            result = fetcher.fetch_chain(vix_data=vix_data, timestamp=timestamp)
+        return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    from utils.helpers import load_config
+
+    batch = BatchOptionsFetcher(load_config())
+    frame = batch.fetch_universe()
+    print(frame.get_timing_report())
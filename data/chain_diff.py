@@ -0,0 +1,278 @@
+"""
+chain_diff.py - Diff incrementale tra snapshot successivi della catena opzioni
+"""
+from datetime import date
+import numpy as np
+import pandas as pd
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Campi confrontati tra due snapshot dello stesso contratto
+DIFF_COLUMNS = ['volume', 'open_interest', 'implied_volatility', 'bid', 'ask', 'lastPrice']
+
+# Un contratto in una scadenza è identificato da tipo e strike
+CONTRACT_KEY = ['option_type', 'strike']
+
+
+def _snapshot_frame(chain):
+    """Vista (option_type, strike) -> campi confrontati di una OptionChain"""
+    frame = chain.to_frame()[CONTRACT_KEY + DIFF_COLUMNS]
+    frame = frame.drop_duplicates(CONTRACT_KEY, keep='last')
+    return frame.set_index(CONTRACT_KEY).sort_index()
+
+
+def _stale_keys(store, ticker, listed=None, today=None):
+    """Chiavi (ticker, scadenza) scadute o non più presenti tra le scadenze quotate"""
+    today = (today or date.today()).isoformat()
+    listed = set(listed) if listed is not None else None
+    return [
+        key for key in store
+        if key[0] == ticker and (str(key[1]) < today or (listed is not None and key[1] not in listed))
+    ]
+
+
+class ChainChangeSet:
+    """
+    Contratti aggiunti, rimossi o modificati tra due snapshot di una scadenza.
+    is_full indica il primo snapshot (tutti i contratti risultano aggiunti).
+    """
+
+    def __init__(self, ticker, expiration, added, removed, changed, previous, is_full=False):
+        self.ticker = ticker
+        self.expiration = expiration
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.previous = previous  # valori precedenti delle righe in changed
+        self.is_full = is_full
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    @property
+    def is_empty(self):
+        return len(self) == 0
+
+    def deltas(self):
+        """
+        Variazioni di volume e OI per contratto (indice option_type, strike),
+        con flag listed: False per i contratti rimossi dalla catena
+        """
+        columns = ['volume', 'open_interest']
+        parts = []
+        if len(self.added):
+            part = self.added[columns].rename(columns=lambda c: f"{c}_delta")
+            parts.append(part.assign(listed=True))
+        if len(self.changed):
+            part = (self.changed[columns] - self.previous[columns]).rename(columns=lambda c: f"{c}_delta")
+            parts.append(part.assign(listed=True))
+        if len(self.removed):
+            part = (-self.removed[columns]).rename(columns=lambda c: f"{c}_delta")
+            parts.append(part.assign(listed=False))
+
+        if not parts:
+            return pd.DataFrame(
+                columns=['volume_delta', 'open_interest_delta', 'listed'],
+                index=pd.MultiIndex.from_tuples([], names=CONTRACT_KEY)
+            )
+        return pd.concat(parts)
+
+    def get_summary(self):
+        return {
+            'ticker': self.ticker,
+            'expiration': self.expiration,
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'changed': len(self.changed),
+            'is_full': self.is_full
+        }
+
+
+class ChainDiffer:
+    """Tiene l'ultimo snapshot per (ticker, scadenza) ed emette i change set"""
+
+    def __init__(self):
+        self._snapshots = {}
+
+    def diff(self, chain):
+        key = (chain.ticker, chain.expiration)
+        current = _snapshot_frame(chain)
+        previous = self._snapshots.get(key)
+        self._snapshots[key] = current
+
+        empty = current.iloc[0:0]
+        if previous is None:
+            return ChainChangeSet(chain.ticker, chain.expiration, current, empty, empty, empty, is_full=True)
+
+        added = current.loc[current.index.difference(previous.index)]
+        removed = previous.loc[previous.index.difference(current.index)]
+
+        common = current.index.intersection(previous.index)
+        current_common = current.loc[common]
+        previous_common = previous.loc[common]
+        unchanged = np.isclose(
+            current_common.to_numpy(dtype=float),
+            previous_common.to_numpy(dtype=float),
+            rtol=0, atol=1e-9, equal_nan=True
+        ).all(axis=1)
+
+        change_set = ChainChangeSet(
+            chain.ticker, chain.expiration, added, removed,
+            current_common[~unchanged], previous_common[~unchanged]
+        )
+        logger.debug(f"Diff {chain.ticker} {chain.expiration}: {change_set.get_summary()}")
+        return change_set
+
+    def reset(self, ticker=None, expiration=None):
+        """Dimentica gli snapshot (tutti, di un ticker o di una scadenza)"""
+        for key in list(self._snapshots):
+            if (ticker is None or key[0] == ticker) and (expiration is None or key[1] == expiration):
+                del self._snapshots[key]
+
+    def evict(self, ticker, listed=None, today=None):
+        """
+        Rimuove gli snapshot del ticker scaduti (scadenza < oggi) o non più
+        quotati (assenti da listed); restituisce le chiavi rimosse
+        """
+        stale = _stale_keys(self._snapshots, ticker, listed, today)
+        for key in stale:
+            del self._snapshots[key]
+        return stale
+
+
+class ExpirationAggregates:
+    """
+    Aggregati di una scadenza (somme PCR, muri, max pain) mantenuti sulla
+    griglia degli strike e aggiornati solo con le variazioni dei change set
+    """
+
+    def __init__(self, ticker, expiration):
+        self.ticker = ticker
+        self.expiration = expiration
+        self.spot_price = 0.0
+        self.strikes = np.empty(0)
+        self.open_interest = {'call': np.empty(0), 'put': np.empty(0)}
+        self.volume = {'call': np.empty(0), 'put': np.empty(0)}
+        self.listed = {'call': np.empty(0, dtype=bool), 'put': np.empty(0, dtype=bool)}
+        # pain[i] = OI call con strike < K_i + OI put con strike > K_i
+        self.pain = np.empty(0)
+        self.totals = {'call_volume': 0.0, 'put_volume': 0.0, 'call_oi': 0.0, 'put_oi': 0.0}
+
+    def _ensure_strikes(self, strikes):
+        """Estende la griglia con nuovi strike (raro: ricalcolo O(n) del pain)"""
+        new_strikes = np.setdiff1d(strikes, self.strikes)
+        if len(new_strikes) == 0:
+            return
+
+        merged = np.union1d(self.strikes, new_strikes)
+        positions = np.searchsorted(merged, self.strikes)
+        for option_type in ('call', 'put'):
+            for store, dtype in ((self.open_interest, float), (self.volume, float), (self.listed, bool)):
+                grown = np.zeros(len(merged), dtype=dtype)
+                grown[positions] = store[option_type]
+                store[option_type] = grown
+        self.strikes = merged
+
+        call_oi, put_oi = self.open_interest['call'], self.open_interest['put']
+        calls_below = np.concatenate(([0.0], np.cumsum(call_oi)[:-1]))
+        puts_above = put_oi.sum() - np.cumsum(put_oi)
+        self.pain = calls_below + puts_above
+
+    def apply(self, change_set, spot_price=None):
+        """Applica un change set agli aggregati"""
+        if spot_price is not None:
+            self.spot_price = float(spot_price)
+
+        deltas = change_set.deltas()
+        if deltas.empty:
+            return self
+
+        self._ensure_strikes(np.unique(deltas.index.get_level_values('strike').to_numpy(dtype=float)))
+        size = len(self.strikes)
+
+        for option_type in ('call', 'put'):
+            if option_type not in deltas.index.get_level_values('option_type'):
+                continue
+            rows = deltas.xs(option_type, level='option_type')
+            positions = np.searchsorted(self.strikes, rows.index.to_numpy(dtype=float))
+            oi_delta = rows['open_interest_delta'].to_numpy(dtype=float)
+            volume_delta = rows['volume_delta'].to_numpy(dtype=float)
+
+            np.add.at(self.open_interest[option_type], positions, oi_delta)
+            np.add.at(self.volume[option_type], positions, volume_delta)
+            self.listed[option_type][positions] = rows['listed'].to_numpy(dtype=bool)
+            self.totals[f"{option_type}_oi"] += float(oi_delta.sum())
+            self.totals[f"{option_type}_volume"] += float(volume_delta.sum())
+
+            # Aggiornamento del pain con array di differenze (niente ricalcolo sui contratti)
+            increments = np.zeros(size + 1)
+            if option_type == 'call':
+                # OI call a strike k pesa su tutti gli strike K > k
+                np.add.at(increments, positions + 1, oi_delta)
+            else:
+                # OI put a strike k pesa su tutti gli strike K < k
+                increments[0] += oi_delta.sum()
+                np.add.at(increments, positions, -oi_delta)
+            self.pain += np.cumsum(increments)[:size]
+
+        return self
+
+    def get_pcr(self):
+        """Put/Call ratio su volume e OI dalle somme mantenute"""
+        totals = self.totals
+        return {
+            'put_volume': totals['put_volume'],
+            'call_volume': totals['call_volume'],
+            'put_oi': totals['put_oi'],
+            'call_oi': totals['call_oi'],
+            'pcr_volume': totals['put_volume'] / totals['call_volume'] if totals['call_volume'] > 0 else 0,
+            'pcr_oi': totals['put_oi'] / totals['call_oi'] if totals['call_oi'] > 0 else 0
+        }
+
+    def get_walls(self, min_oi_threshold=1000):
+        """Muri di opzioni e max pain nello stesso formato di SkewAnalyzer.generate_option_walls"""
+        walls = {'calls': [], 'puts': [], 'spot_price': self.spot_price, 'max_pain': 0}
+
+        for key, option_type in (('calls', 'call'), ('puts', 'put')):
+            oi = np.where(self.listed[option_type], self.open_interest[option_type], -1)
+            if len(oi) == 0 or oi.max() <= min_oi_threshold:
+                continue
+            idx = int(np.argmax(oi))
+            strike = float(self.strikes[idx])
+            walls[key].append({
+                'strike': strike,
+                'open_interest': int(oi[idx]),
+                'distance_percent': (strike - self.spot_price) / self.spot_price * 100 if self.spot_price else 0.0,
+                'distance_points': strike - self.spot_price
+            })
+
+        listed = self.listed['call'] | self.listed['put']
+        if self.listed['call'].any() and self.listed['put'].any():
+            pain = np.where(listed, self.pain, np.inf)
+            walls['max_pain'] = float(self.strikes[int(np.argmin(pain))])
+
+        return walls
+
+
+class IncrementalChainAggregates:
+    """Aggregati incrementali per tutte le (ticker, scadenza) osservate"""
+
+    def __init__(self):
+        self._aggregates = {}
+
+    def apply(self, change_set, spot_price=None):
+        key = (change_set.ticker, change_set.expiration)
+        if change_set.is_full or key not in self._aggregates:
+            self._aggregates[key] = ExpirationAggregates(*key)
+        return self._aggregates[key].apply(change_set, spot_price)
+
+    def get(self, ticker, expiration):
+        return self._aggregates.get((ticker, expiration))
+
+    def evict(self, ticker, listed=None, today=None):
+        """Come ChainDiffer.evict per gli aggregati"""
+        stale = _stale_keys(self._aggregates, ticker, listed, today)
+        for key in stale:
+            del self._aggregates[key]
+        return stale
@@ -0,0 +1,176 @@
+"""
+chain_store.py - Cache su disco (Parquet) delle catene opzioni sotto data/cache
+"""
+import json
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from data.option_chain import OptionChain
+from utils.logger import setup_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = setup_logger(__name__)
+
+DEFAULT_CACHE_DIR = "data/cache"
+DEFAULT_BUCKET_SECONDS = 300   # allineato a data_sources.options.update_interval
+DEFAULT_HISTORY_DAYS = 30      # allineato a data_sources.market_data.history_days
+GC_INTERVAL_SECONDS = 3600
+
+# Chiave dei metadati della catena nello schema Parquet
+METADATA_KEY = b'option_chain'
+
+
+class ChainDiskCache:
+    """
+    Catene opzioni persistite in Parquet, partizionate per
+    ticker/scadenza/data e indicizzate per bucket temporale:
+
+        <root>/chains/ticker=SPY/expiration=2024-01-19/date=2024-01-10/bucket_<n>.parquet
+
+    Una catena salvata nel bucket corrente viene riletta da disco invece di
+    essere riscaricata. I bucket più vecchi di history_days vengono rimossi.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, bucket_seconds=DEFAULT_BUCKET_SECONDS,
+                 history_days=DEFAULT_HISTORY_DAYS):
+        self.root = Path(root) / 'chains'
+        self.bucket_seconds = bucket_seconds
+        self.history_days = history_days
+        self.enabled = PYARROW_AVAILABLE
+        self._last_gc = 0.0
+
+        if not self.enabled:
+            logger.warning("⚠️ pyarrow non installato: cache catene su disco disabilitata")
+
+    @classmethod
+    def from_config(cls, config):
+        data_sources = (config or {}).get('data_sources', {})
+        options_config = data_sources.get('options', {})
+        market_config = data_sources.get('market_data', {})
+        return cls(
+            root=options_config.get('cache_dir', DEFAULT_CACHE_DIR),
+            bucket_seconds=options_config.get('update_interval', DEFAULT_BUCKET_SECONDS),
+            history_days=market_config.get('history_days', DEFAULT_HISTORY_DAYS)
+        )
+
+    def bucket_key(self, when=None):
+        """Indice del bucket temporale che contiene when (default: adesso)"""
+        when = when or datetime.now()
+        return int(when.timestamp() // self.bucket_seconds)
+
+    def _partition(self, ticker, expiration, when):
+        return self.root / f"ticker={ticker}" / f"expiration={expiration}" / f"date={when.date().isoformat()}"
+
+    def _path(self, ticker, expiration, when):
+        return self._partition(ticker, expiration, when) / f"bucket_{self.bucket_key(when)}.parquet"
+
+    def load(self, ticker, expiration, when=None):
+        """Catena del bucket corrente, o None se non presente su disco"""
+        if not self.enabled:
+            return None
+
+        when = when or datetime.now()
+        path = self._path(ticker, expiration, when)
+        if not path.exists():
+            return None
+
+        try:
+            table = pq.read_table(path)
+            metadata = json.loads(table.schema.metadata[METADATA_KEY])
+            frame = table.to_pandas()
+        except Exception as e:
+            logger.warning(f"Errore lettura cache {path}: {e}")
+            return None
+
+        chain = OptionChain(
+            calls=frame[frame['option_type'] == 'call'],
+            puts=frame[frame['option_type'] == 'put'],
+            **metadata
+        )
+        logger.debug(f"Catena {ticker} {expiration} letta da cache disco")
+        return chain
+
+    def cached_expirations(self, ticker, when=None):
+        """Scadenze del ticker già salvate nel bucket corrente (ordinate)"""
+        if not self.enabled:
+            return []
+
+        when = when or datetime.now()
+        bucket_file = f"bucket_{self.bucket_key(when)}.parquet"
+        date_dir = f"date={when.date().isoformat()}"
+        expirations = []
+        for expiration_dir in sorted((self.root / f"ticker={ticker}").glob('expiration=*')):
+            if (expiration_dir / date_dir / bucket_file).exists():
+                expirations.append(expiration_dir.name.split('=', 1)[1])
+        return expirations
+
+    def save(self, chain, when=None):
+        """Salva la catena nel bucket corrente (scrittura atomica)"""
+        if not self.enabled or not chain.expiration or not chain.ticker:
+            return None
+
+        when = when or datetime.now()
+        path = self._path(chain.ticker, chain.expiration, when)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            frame = chain.to_frame()
+            frame['contractSymbol'] = frame['contractSymbol'].astype(str)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            metadata = {
+                'spot_price': chain.spot_price,
+                'expiration': chain.expiration,
+                'ticker': chain.ticker,
+                'timestamp': chain.timestamp,
+                'vix_data': chain.vix_data,
+                'market_return': float(chain.market_return or 0)
+            }
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                METADATA_KEY: json.dumps(metadata, default=str).encode()
+            })
+
+            tmp_path = path.with_suffix('.tmp')
+            pq.write_table(table, tmp_path)
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.warning(f"Errore scrittura cache {path}: {e}")
+            return None
+
+        if time.monotonic() - self._last_gc > GC_INTERVAL_SECONDS:
+            self.gc()
+        return path
+
+    def gc(self, now=None):
+        """Rimuove le partizioni data= più vecchie di history_days"""
+        if not self.root.exists():
+            return 0
+
+        self._last_gc = time.monotonic()
+        cutoff = ((now or datetime.now()) - timedelta(days=self.history_days)).date()
+        removed = 0
+
+        for date_dir in self.root.glob('ticker=*/expiration=*/date=*'):
+            try:
+                partition_date = datetime.strptime(date_dir.name.split('=', 1)[1], '%Y-%m-%d').date()
+            except ValueError:
+                continue
+            if partition_date < cutoff:
+                shutil.rmtree(date_dir, ignore_errors=True)
+                removed += 1
+
+        # Pulisce le directory di scadenza/ticker rimaste vuote
+        for directory in sorted(self.root.glob('ticker=*/expiration=*')) + sorted(self.root.glob('ticker=*')):
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+
+        if removed:
+            logger.info(f"🧹 Cache catene: rimosse {removed} partizioni più vecchie di {self.history_days} giorni")
+        return removed
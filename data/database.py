@@ -3,27 +3,151 @@ Database SQLite per storage dati storici
 """
 
 import sqlite3
+import threading
+import weakref
 import pandas as pd
 from datetime import datetime, timedelta
 import json
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Colonne di option_quotes e corrispondenti colonne di OptionChain.to_frame()
+QUOTE_COLUMNS = {
+    'strike': 'strike',
+    'option_type': 'option_type',
+    'bid': 'bid',
+    'ask': 'ask',
+    'last_price': 'lastPrice',
+    'implied_volatility': 'implied_volatility',
+    'volume': 'volume',
+    'open_interest': 'open_interest',
+    'delta': 'delta',
+    'gamma': 'gamma',
+    'vega': 'vega',
+    'theta': 'theta'
+}
+
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_MMAP_MB = 256
+DEFAULT_CACHE_MB = 32
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+def _iso_timestamp(value: Any) -> str:
+    """Timestamp ISO uniforme: i confronti tra stringhe in SQLite restano coerenti"""
+    return pd.Timestamp(value).isoformat()
+
+class _ConnectionLease:
+    """Connessione assegnata a un thread (vive nel suo threading.local)"""
+    
+    __slots__ = ('conn', '__weakref__')
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+def _release_connection(conn: sqlite3.Connection, idle: List, lock: threading.Lock):
+    """Restituisce al pool la connessione di un thread terminato"""
+    try:
+        conn.rollback()  # transazione lasciata aperta dal thread terminato
+    except sqlite3.ProgrammingError:
+        return  # già chiusa da close()
+    with lock:
+        idle.append(conn)
+
 class OptionsDatabase:
-    """Database per storage dati opzioni e sentiment"""
+    """
+    Database per storage dati opzioni e sentiment.
     
-    def __init__(self, db_path: str = "options_data.db"):
+    Il file è in modalità WAL: i lettori (thread Streamlit) leggono uno
+    snapshot consistente senza attendere le scritture dello scheduler.
+    Ogni thread usa la propria connessione (self.conn), presa dal pool e
+    legata al suo threading.local: quando il thread termina, un
+    weakref.finalize annulla l'eventuale transazione aperta e la rimette
+    tra quelle libere (es. le esecuzioni Streamlit). Senza connessioni
+    libere se ne apre una con busy_timeout e pragma di tuning. close() le
+    chiude tutte.
+    """
+    
+    def __init__(self, db_path: str = "options_data.db", busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 synchronous: str = "NORMAL", mmap_mb: int = DEFAULT_MMAP_MB, cache_mb: int = DEFAULT_CACHE_MB):
         self.db_path = Path(db_path)
-        self.conn = None
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous.upper() if synchronous.upper() in SYNCHRONOUS_MODES else "NORMAL"
+        self.mmap_mb = mmap_mb
+        self.cache_mb = cache_mb
+        
+        self._local = threading.local()
+        self._connections = []   # tutte le connessioni aperte
+        self._idle = []          # connessioni restituite da thread terminati
+        self._connections_lock = threading.Lock()
+        # Un database in memoria esiste solo nella sua connessione: condivisa tra i thread
+        self._shared = str(db_path) == ':memory:'
         self._init_database()
     
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None):
+        db_config = (config or {}).get('data_sources', {}).get('database', {}) or {}
+        return cls(
+            db_path=db_config.get('path', "options_data.db"),
+            busy_timeout_ms=db_config.get('busy_timeout_ms', DEFAULT_BUSY_TIMEOUT_MS),
+            synchronous=db_config.get('synchronous', "NORMAL"),
+            mmap_mb=db_config.get('mmap_mb', DEFAULT_MMAP_MB),
+            cache_mb=db_config.get('cache_mb', DEFAULT_CACHE_MB)
+        )
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connessione del thread corrente"""
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            lease = self._acquire()
+            self._local.lease = lease
+        return lease.conn
+    
+    def _acquire(self) -> "_ConnectionLease":
+        with self._connections_lock:
+            if self._shared and self._connections:
+                return _ConnectionLease(self._connections[0])
+            conn = self._idle.pop() if self._idle else None
+        
+        if conn is None:
+            conn = self._connect()
+            with self._connections_lock:
+                self._connections.append(conn)
+        
+        lease = _ConnectionLease(conn)
+        if not self._shared:
+            # Eseguito quando il threading.local del thread viene liberato (thread terminato)
+            weakref.finalize(lease, _release_connection, conn, self._idle, self._connections_lock)
+        return lease
+    
+    def get_pool_stats(self) -> Dict:
+        with self._connections_lock:
+            total, idle = len(self._connections), len(self._idle)
+        return {
+            'connections': total,
+            'in_use': total - idle
+        }
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_mb) * 1024 * 1024}')
+        conn.execute(f'PRAGMA cache_size = {-int(self.cache_mb) * 1024}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+    
     def _init_database(self):
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.conn.row_factory = sqlite3.Row
+            # journal_mode è persistente nel file: basta impostarlo una volta
+            journal_mode = self.conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+            if journal_mode.lower() != 'wal' and not self._shared:
+                logger.warning(f"⚠️ Modalità WAL non disponibile per {self.db_path} ({journal_mode})")
             
             cursor = self.conn.cursor()
             
@@ -51,6 +175,29 @@ class OptionsDatabase:
                 )
             ''')
             
+            # Un contratto per riga: la chiave primaria (ticker, scadenza, tipo,
+            # strike, timestamp) serve le serie storiche di uno strike
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS option_quotes (
+                    ticker TEXT NOT NULL,
+                    expiration DATE NOT NULL,
+                    option_type TEXT NOT NULL,
+                    strike REAL NOT NULL,
+                    timestamp DATETIME NOT NULL,
+                    bid REAL,
+                    ask REAL,
+                    last_price REAL,
+                    implied_volatility REAL,
+                    volume REAL,
+                    open_interest REAL,
+                    delta REAL,
+                    gamma REAL,
+                    vega REAL,
+                    theta REAL,
+                    PRIMARY KEY (ticker, expiration, option_type, strike, timestamp)
+                ) WITHOUT ROWID
+            ''')
+            
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS sentiment_data (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -67,6 +214,16 @@ class OptionsDatabase:
                 )
             ''')
             
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS seen_items (
+                    item_key TEXT PRIMARY KEY,
+                    source_name TEXT,
+                    sentiment_id INTEGER,
+                    first_seen DATETIME NOT NULL,
+                    last_seen DATETIME NOT NULL
+                )
+            ''')
+            
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS trading_signals (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -86,7 +243,22 @@ class OptionsDatabase:
             
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_options_ticker ON options_data(ticker)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_options_timestamp ON options_data(timestamp)')
+            # Catena completa di un ticker a un istante (tutte le scadenze)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_quotes_ticker_timestamp ON option_quotes(ticker, timestamp)')
+            # Serie storica di uno strike su tutte le scadenze (get_strike_history senza expiration)
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_quotes_strike_timestamp ON option_quotes(ticker, option_type, strike, timestamp)'
+            )
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_sentiment_timestamp ON sentiment_data(fetch_timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_seen_last_seen ON seen_items(last_seen)')
+            
+            # Righe scritte con l'adattatore datetime di default di sqlite3
+            # ("YYYY-MM-DD HH:MM:SS"): portate al formato ISO con "T"
+            for table, column in (('sentiment_data', 'fetch_timestamp'), ('seen_items', 'first_seen'),
+                                  ('seen_items', 'last_seen')):
+                cursor.execute(
+                    f"UPDATE {table} SET {column} = replace({column}, ' ', 'T') WHERE {column} LIKE '____-__-__ %'"
+                )
             
             self.conn.commit()
             logger.info(f"✅ Database inizializzato: {self.db_path}")
@@ -94,59 +266,114 @@ class OptionsDatabase:
         except Exception as e:
             logger.error(f"❌ Errore inizializzazione database: {e}")
     
-    def save_options_data(self, ticker: str, options_data: Dict):
+    def save_options_data(self, ticker: str, options_data: Any):
+        """Salva uno snapshot (OptionChain o dict legacy); vedi save_many"""
+        self.save_many([(ticker, options_data)])
+    
+    def save_many(self, snapshots: Iterable[Tuple[str, Any]]) -> int:
+        """
+        Salva molti snapshot (ticker, OptionChain/OptionSurface/dict legacy)
+        con un solo executemany in un'unica transazione: un commit (e un
+        fsync) per lotto invece che per scadenza. Le metriche aggregate vanno
+        in options_data, i singoli contratti in option_quotes. Restituisce
+        gli snapshot scritti
+        """
+        rows = []
+        quotes = []
+        for ticker, options_data in snapshots:
+            for chain_data in self._expand_snapshot(options_data):
+                try:
+                    snapshot = self._snapshot_rows(ticker, chain_data)
+                except Exception as e:
+                    logger.error(f"❌ Errore calcolo metriche opzioni {ticker}: {e}")
+                    continue
+                if snapshot is not None:
+                    rows.append(snapshot[0])
+                    quotes.extend(snapshot[1])
+        if not rows:
+            return 0
+        
         try:
-            from analysis.skew_analyzer import SkewAnalyzer
-            from analysis.pcr_analyzer import PCRAnalyzer
-            
-            current_price = options_data.get('current_price', 0)
-            expiration = options_data.get('expiration')
-            timestamp = options_data.get('timestamp', datetime.now())
-            
-            if not expiration:
-                logger.warning(f"Nessuna scadenza per {ticker}")
-                return
-            
-            skew_analyzer = SkewAnalyzer()
-            pcr_analyzer = PCRAnalyzer()
-            
-            skew_metrics = skew_analyzer.calculate_skew(options_data)
-            pcr_metrics = pcr_analyzer.calculate_pcr(options_data)
-            
-            cursor = self.conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO options_data (
-                    ticker, expiration, timestamp, current_price,
-                    total_puts, total_calls, put_volume, call_volume,
-                    put_oi, call_oi, pcr_volume, pcr_oi,
-                    skew_25d, skew_10d, iv_mean, iv_std, data_json
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                ticker,
-                expiration,
-                timestamp,
-                current_price,
-                len(options_data.get('puts', [])),
-                len(options_data.get('calls', [])),
-                pcr_metrics.get('put_volume', 0),
-                pcr_metrics.get('call_volume', 0),
-                pcr_metrics.get('put_oi', 0),
-                pcr_metrics.get('call_oi', 0),
-                pcr_metrics.get('pcr_volume', 0),
-                pcr_metrics.get('pcr_oi', 0),
-                skew_metrics.get('skew_25d', 0),
-                skew_metrics.get('skew_10d', 0),
-                skew_metrics.get('iv_mean', 0),
-                skew_metrics.get('iv_std', 0),
-                json.dumps(options_data, default=str)
-            ))
-            
-            self.conn.commit()
-            logger.debug(f"✅ Dati opzioni salvati per {ticker} {expiration}")
-            
+            with self.conn:
+                self.conn.executemany('''
+                    INSERT OR REPLACE INTO options_data (
+                        ticker, expiration, timestamp, current_price,
+                        total_puts, total_calls, put_volume, call_volume,
+                        put_oi, call_oi, pcr_volume, pcr_oi,
+                        skew_25d, skew_10d, iv_mean, iv_std, data_json
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                self.conn.executemany(f'''
+                    INSERT OR REPLACE INTO option_quotes (
+                        ticker, expiration, timestamp, {', '.join(QUOTE_COLUMNS)}
+                    ) VALUES ({', '.join('?' * (len(QUOTE_COLUMNS) + 3))})
+                ''', quotes)
         except Exception as e:
-            logger.error(f"❌ Errore salvataggio dati opzioni {ticker}: {e}")
+            logger.error(f"❌ Errore salvataggio dati opzioni ({len(rows)} snapshot): {e}")
+            return 0
+        
+        logger.debug(f"✅ Salvati {len(rows)} snapshot opzioni ({len(quotes)} contratti)")
+        return len(rows)
+    
+    @staticmethod
+    def _expand_snapshot(options_data: Any) -> List[Any]:
+        """Una superficie diventa una catena per scadenza"""
+        from data.option_chain import OptionSurface
+        
+        if isinstance(options_data, OptionSurface):
+            return list(options_data.chains.values())
+        return [options_data]
+    
+    @staticmethod
+    def _snapshot_rows(ticker: str, options_data: Any) -> Optional[Tuple[Tuple, List[Tuple]]]:
+        """Riga di options_data e righe di option_quotes di una catena"""
+        from analysis.skew_analyzer import SkewAnalyzer
+        from data.option_chain import OptionChain
+        
+        chain = OptionChain.coerce(options_data)
+        legacy = options_data if isinstance(options_data, dict) else {}
+        expiration = legacy.get('expiration') or chain.expiration
+        if not expiration:
+            logger.warning(f"Nessuna scadenza per {ticker}")
+            return None
+        
+        totals = chain.totals()
+        skew_analyzer = SkewAnalyzer(chain)
+        skew_25d = skew_analyzer._get_option_iv(0.25, 'put') - skew_analyzer._get_option_iv(0.25, 'call')
+        skew_10d = skew_analyzer._get_option_iv(0.10, 'put') - skew_analyzer._get_option_iv(0.10, 'call')
+        contracts = chain.to_frame()
+        iv = contracts['implied_volatility']
+        iv = iv[iv > 0]
+        timestamp = _iso_timestamp(legacy.get('timestamp') or chain.timestamp)
+        
+        # I contratti sono in option_quotes: qui restano solo i metadati di mercato
+        metadata = {
+            'spot_price': chain.spot_price,
+            'vix_data': chain.vix_data,
+            'market_return': chain.market_return
+        }
+        quote_columns = [contracts[column].tolist() for column in QUOTE_COLUMNS.values()]
+        quotes = [(ticker, expiration, timestamp, *values) for values in zip(*quote_columns)]
+        
+        return (
+            ticker,
+            expiration,
+            timestamp,
+            legacy.get('current_price') or chain.spot_price,
+            len(chain.puts),
+            len(chain.calls),
+            totals['put_volume'],
+            totals['call_volume'],
+            totals['put_oi'],
+            totals['call_oi'],
+            totals['put_volume'] / totals['call_volume'] if totals['call_volume'] > 0 else 0,
+            totals['put_oi'] / totals['call_oi'] if totals['call_oi'] > 0 else 0,
+            skew_25d,
+            skew_10d,
+            float(iv.mean()) if len(iv) else 0,
+            float(iv.std()) if len(iv) > 1 else 0,
+            json.dumps(metadata, default=str)
+        ), quotes
     
     def get_historical_skew(self, ticker: str, days: int = 30) -> pd.DataFrame:
         try:
@@ -160,11 +387,12 @@ class OptionsDatabase:
                     pcr_oi
                 FROM options_data
                 WHERE ticker = ?
-                AND timestamp >= datetime('now', '-? days')
+                AND timestamp >= ?
                 ORDER BY timestamp
             '''
             
-            df = pd.read_sql_query(query, self.conn, params=(ticker, days))
+            cutoff = _iso_timestamp(datetime.now() - timedelta(days=days))
+            df = pd.read_sql_query(query, self.conn, params=(ticker, cutoff))
             
             if df.empty:
                 logger.warning(f"Nessun dato storico per {ticker}")
@@ -178,11 +406,204 @@ class OptionsDatabase:
         except Exception as e:
             logger.error(f"Errore recupero storico skew {ticker}: {e}")
             return pd.DataFrame()
+
+    def get_option_quotes(self, ticker: str, expiration: Optional[str] = None, option_type: Optional[str] = None,
+                          min_strike: Optional[float] = None, max_strike: Optional[float] = None,
+                          start: Any = None, end: Any = None) -> pd.DataFrame:
+        """
+        Contratti di option_quotes in un DataFrame colonnare, filtrati per
+        scadenza, tipo ('call'/'put'), intervallo di strike e di tempo
+        """
+        conditions = ['ticker = ?']
+        params = [ticker]
+        for clause, value in (('expiration = ?', expiration),
+                              ('option_type = ?', option_type),
+                              ('strike >= ?', min_strike),
+                              ('strike <= ?', max_strike),
+                              ('timestamp >= ?', _iso_timestamp(start) if start is not None else None),
+                              ('timestamp <= ?', _iso_timestamp(end) if end is not None else None)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+
+        try:
+            df = pd.read_sql_query(
+                f'''
+                SELECT * FROM option_quotes
+                WHERE {' AND '.join(conditions)}
+                ORDER BY timestamp, expiration, option_type, strike
+                ''',
+                self.conn, params=params
+            )
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            return df
+
+        except Exception as e:
+            logger.error(f"Errore recupero contratti {ticker}: {e}")
+            return pd.DataFrame()
+
+    def get_strike_history(self, ticker: str, strike: float, option_type: str = 'put',
+                           expiration: Optional[str] = None, start: Any = None, end: Any = None) -> pd.DataFrame:
+        """Serie storica di uno strike (es. OI della put 450), indicizzata per timestamp"""
+        df = self.get_option_quotes(ticker, expiration=expiration, option_type=option_type,
+                                    min_strike=strike, max_strike=strike, start=start, end=end)
+        if df.empty:
+            return df
+        return df.set_index('timestamp')
+
+    def get_chain_snapshot(self, ticker: str, at: Any = None, expiration: Optional[str] = None) -> pd.DataFrame:
+        """Ultima catena salvata all'istante at (default: la più recente)"""
+        query = 'SELECT MAX(timestamp) FROM option_quotes WHERE ticker = ?'
+        params = [ticker]
+        if at is not None:
+            query += ' AND timestamp <= ?'
+            params.append(_iso_timestamp(at))
+        timestamp = self.conn.execute(query, params).fetchone()[0]
+        if timestamp is None:
+            return pd.DataFrame()
+        return self.get_option_quotes(ticker, expiration=expiration, start=timestamp, end=timestamp)
+
+    def filter_seen(self, item_keys: List[str]) -> set:
+        """Chiavi (link/GUID/message-id) già ingerite, aggiornandone last_seen"""
+        keys = list(dict.fromkeys(k for k in item_keys if k))
+        if not keys:
+            return set()
+        
+        seen = set()
+        now = _iso_timestamp(datetime.now())
+        cursor = self.conn.cursor()
+        # Blocchi sotto il limite di parametri di SQLite
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = cursor.execute(
+                f'SELECT item_key FROM seen_items WHERE item_key IN ({placeholders})', chunk
+            ).fetchall()
+            found = [row[0] for row in rows]
+            seen.update(found)
+            cursor.executemany('UPDATE seen_items SET last_seen = ? WHERE item_key = ?',
+                               [(now, key) for key in found])
+        self.conn.commit()
+        return seen
+    
+    def save_sentiment_items(self, items: List[Dict]) -> List[int]:
+        """
+        Salva gli elementi analizzati in sentiment_data e registra in
+        seen_items le loro chiavi (item_keys), in un'unica transazione
+        """
+        ids = []
+        now = _iso_timestamp(datetime.now())
+        try:
+            with self.conn:
+                for item in items:
+                    sentiment = item.get('sentiment', {})
+                    cursor = self.conn.execute('''
+                        INSERT INTO sentiment_data (
+                            source_type, source_name, title, content, sentiment_score,
+                            confidence, tickers_mentioned, published_date, fetch_timestamp, metadata_json
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        item.get('source_type', ''),
+                        item.get('source_name', item.get('source', '')),
+                        item.get('title', ''),
+                        item.get('text', '')[:5000],
+                        sentiment.get('final_score', 0),
+                        sentiment.get('confidence'),
+                        json.dumps(sentiment.get('tickers_mentioned', [])),
+                        item.get('published', item.get('published_date', item.get('timestamp'))),
+                        now,
+                        json.dumps({
+                            'link': item.get('link', ''),
+                            'sources': item.get('sources', []),
+                            'duplicate_count': item.get('duplicate_count', 0),
+                            'priority': item.get('priority', 1),
+                            'category': sentiment.get('category'),
+                            'vader_compound': sentiment.get('vader_compound'),
+                            'keyword_net': sentiment.get('keyword_net')
+                        }, default=str)
+                    ))
+                    sentiment_id = cursor.lastrowid
+                    item['sentiment_id'] = sentiment_id
+                    ids.append(sentiment_id)
+                    self.conn.executemany('''
+                        INSERT OR REPLACE INTO seen_items (item_key, source_name, sentiment_id, first_seen, last_seen)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', [(key, item.get('source_name', ''), sentiment_id, now, now) for key in item['item_keys']])
+        except Exception as e:
+            logger.error(f"❌ Errore salvataggio sentiment: {e}")
+            return []
+        
+        logger.debug(f"✅ Salvati {len(ids)} elementi sentiment")
+        return ids
+    
+    def mark_seen(self, entries: List[Dict]) -> int:
+        """
+        Registra in seen_items chiavi senza una riga propria in sentiment_data
+        (duplicati di elementi già salvati: item_key, source_name, sentiment_id)
+        """
+        if not entries:
+            return 0
+        now = _iso_timestamp(datetime.now())
+        try:
+            with self.conn:
+                self.conn.executemany('''
+                    INSERT OR REPLACE INTO seen_items (item_key, source_name, sentiment_id, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(entry['item_key'], entry.get('source_name', ''), entry.get('sentiment_id'), now, now)
+                      for entry in entries])
+        except Exception as e:
+            logger.error(f"❌ Errore registrazione seen_items: {e}")
+            return 0
+        return len(entries)
+    
+    def purge_options_history(self, days: int = 30) -> int:
+        """
+        Rimuove snapshot (options_data) e contratti (option_quotes) più vecchi
+        di days giorni, in un'unica transazione; restituisce i contratti rimossi
+        """
+        cutoff = _iso_timestamp(datetime.now() - timedelta(days=days))
+        try:
+            with self.conn:
+                quotes = self.conn.execute('DELETE FROM option_quotes WHERE timestamp < ?', (cutoff,)).rowcount
+                snapshots = self.conn.execute('DELETE FROM options_data WHERE timestamp < ?', (cutoff,)).rowcount
+        except Exception as e:
+            logger.error(f"❌ Errore pulizia storico opzioni: {e}")
+            return 0
+        if quotes or snapshots:
+            logger.info(f"🧹 Storico opzioni: rimossi {snapshots} snapshot e {quotes} contratti più vecchi di {days} giorni")
+        return quotes
+    
+    def purge_seen_items(self, days: int = 7) -> int:
+        """Dimentica le chiavi non più viste da days giorni (uscite dai feed)"""
+        cutoff = _iso_timestamp(datetime.now() - timedelta(days=days))
+        cursor = self.conn.execute('DELETE FROM seen_items WHERE last_seen < ?', (cutoff,))
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def get_sentiment_data(self, hours: int = 24) -> pd.DataFrame:
+        try:
+            cutoff = _iso_timestamp(datetime.now() - timedelta(hours=hours))
+            df = pd.read_sql_query(
+                'SELECT * FROM sentiment_data WHERE fetch_timestamp >= ? ORDER BY fetch_timestamp',
+                self.conn, params=(cutoff,)
+            )
+            if not df.empty:
+                df['fetch_timestamp'] = pd.to_datetime(df['fetch_timestamp'])
+            return df
+        
+        except Exception as e:
+            logger.error(f"Errore recupero dati sentiment: {e}")
+            return pd.DataFrame()
     
     def close(self):
-        if self.conn:
-            self.conn.close()
-            logger.info("✅ Connessione database chiusa")
+        with self._connections_lock:
+            connections, self._connections = list(self._connections), []
+            self._idle.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        if connections:
+            logger.info(f"✅ Connessioni database chiuse ({len(connections)})")
 
 if __name__ == "__main__":
     db = OptionsDatabase("test.db")
@@ -0,0 +1,250 @@
+"""
+dedup.py - Deduplicazione di articoli e messaggi tra fonti (hash esatto + MinHash/LSH)
+"""
+import hashlib
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+import numpy as np
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# MinHash con 64 permutazioni, LSH in 16 bande da 4 righe: coppie con
+# Jaccard >= ~0.5 finiscono nello stesso bucket, poi si verifica la stima
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+DEFAULT_MIN_SIMILARITY = 0.7
+DEFAULT_WINDOW_SECONDS = 24 * 3600
+DEFAULT_MAX_ITEMS = 5000
+MIN_NEAR_DUP_TOKENS = 8        # sotto questa soglia solo hash esatto (titoli brevi)
+SHINGLE_SIZE = 3
+
+BODY_FIELDS = ('content', 'full_text', 'summary', 'message')
+
+_URL_RE = re.compile(r'https?://\S+|www\.\S+')
+_TOKEN_RE = re.compile(r'\w+')
+
+# Permutazioni h(x) = (a*x + b) mod p su hash a 32 bit (p primo di Mersenne 2^31-1)
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_permutation_rng = np.random.default_rng(42)
+_PERM_A = _permutation_rng.integers(1, 1 << 31, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _permutation_rng.integers(0, 1 << 31, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def item_text(item: Dict) -> str:
+    """Titolo + primo corpo disponibile di un articolo o messaggio"""
+    body = next((item[field] for field in BODY_FIELDS if item.get(field)), '')
+    return f"{item.get('title', '')} {body}".strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(_URL_RE.sub(' ', text.lower()))
+
+
+def exact_fingerprint(tokens: List[str]) -> str:
+    return hashlib.blake2b(' '.join(tokens).encode(), digest_size=16).hexdigest()
+
+
+def minhash(tokens: List[str]) -> np.ndarray:
+    """Firma MinHash sugli shingle di SHINGLE_SIZE parole"""
+    shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), 'little') for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    permuted = (hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def item_key(item: Dict) -> str:
+    """Identità stabile di un elemento: GUID del feed, link o id del messaggio"""
+    if item.get('guid'):
+        return f"guid:{item['guid']}"
+    if item.get('link'):
+        return f"link:{item['link']}"
+    source = item.get('source_name', item.get('source', ''))
+    if item.get('message_id'):
+        return f"msg:{source}:{item['message_id']}"
+    digest = hashlib.blake2b(item_text(item).encode(), digest_size=16).hexdigest()
+    return f"text:{source}:{digest}"
+
+
+def _source_entry(item: Dict) -> Dict:
+    return {
+        'source_name': item.get('source_name', item.get('source', '')),
+        'source_type': item.get('source_type', ''),
+        'link': item.get('link', ''),
+        'priority': item.get('priority', 1)
+    }
+
+
+class ArticleDeduplicator:
+    """
+    Collassa i duplicati (stessa notizia da più fonti) in un solo elemento
+    con la lista 'sources' di tutte le provenienze e la priority della fonte
+    più autorevole (priority 1 = più autorevole, come in config.yaml).
+
+    Un indice a finestra mobile (window_seconds, max_items) ricorda gli
+    elementi già emessi: una copia arrivata in un ciclo successivo viene
+    aggiunta alle sources dell'originale e non viene riemessa.
+    """
+
+    def __init__(self, min_similarity: float = DEFAULT_MIN_SIMILARITY, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 max_items: int = DEFAULT_MAX_ITEMS):
+        self.min_similarity = min_similarity
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self._exact = {}
+        self._bands = [{} for _ in range(LSH_BANDS)]
+        self._entries = {}                 # id -> (item, fingerprint, firma MinHash)
+        self._order = deque()              # (inserted_at, id) per la scadenza
+        self._next_id = 0
+        self.last_stats = {}
+        # Chiavi dei duplicati di elementi di cicli precedenti: non arrivano a
+        # save_sentiment_items e vanno registrate a parte in seen_items
+        self.last_suppressed: List[Dict] = []
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None):
+        dedup_config = (config or {}).get('sentiment_sources', {}).get('dedup', {}) or {}
+        return cls(
+            min_similarity=dedup_config.get('min_similarity', DEFAULT_MIN_SIMILARITY),
+            window_seconds=dedup_config.get('window_hours', DEFAULT_WINDOW_SECONDS / 3600) * 3600,
+            max_items=dedup_config.get('max_items', DEFAULT_MAX_ITEMS)
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray):
+        return [signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes() for band in range(LSH_BANDS)]
+
+    def _find(self, fingerprint: str, signature: Optional[np.ndarray]) -> Optional[int]:
+        if fingerprint in self._exact:
+            return self._exact[fingerprint]
+        if signature is None:
+            return None
+
+        for band, key in enumerate(self._band_keys(signature)):
+            for entry_id in self._bands[band].get(key, ()):
+                candidate = self._entries[entry_id][2]
+                if candidate is not None and estimated_jaccard(signature, candidate) >= self.min_similarity:
+                    return entry_id
+        return None
+
+    def _add(self, item: Dict, fingerprint: str, signature: Optional[np.ndarray], now: float):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (item, fingerprint, signature)
+        self._exact[fingerprint] = entry_id
+        if signature is not None:
+            for band, key in enumerate(self._band_keys(signature)):
+                self._bands[band].setdefault(key, []).append(entry_id)
+        self._order.append((now, entry_id))
+
+    def _evict(self, now: float):
+        while self._order and (now - self._order[0][0] > self.window_seconds or len(self._order) > self.max_items):
+            _, entry_id = self._order.popleft()
+            _, fingerprint, signature = self._entries.pop(entry_id)
+            if self._exact.get(fingerprint) == entry_id:
+                del self._exact[fingerprint]
+            if signature is not None:
+                for band, key in enumerate(self._band_keys(signature)):
+                    bucket = self._bands[band][key]
+                    bucket.remove(entry_id)
+                    if not bucket:
+                        del self._bands[band][key]
+
+    @staticmethod
+    def _merge(canonical: Dict, duplicate: Dict):
+        entry = _source_entry(duplicate)
+        if entry not in canonical['sources']:
+            canonical['sources'].append(entry)
+        key = item_key(duplicate)
+        if key not in canonical['item_keys']:
+            canonical['item_keys'].append(key)
+        canonical['duplicate_count'] = len(canonical['sources']) - 1
+        canonical['priority'] = min(canonical.get('priority', 1), duplicate.get('priority', 1))
+
+    def deduplicate(self, items: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """Elementi nuovi e unici del batch (ordine originale), con le fonti collassate"""
+        now = time.time() if now is None else now
+        self._evict(now)
+
+        unique = []
+        batch_ids = set()
+        collapsed = suppressed = 0
+        suppressed_keys = []
+
+        # Le fonti più autorevoli (priority più bassa) diventano l'elemento canonico
+        for item in sorted(items, key=lambda i: i.get('priority', 1)):
+            tokens = tokenize(item_text(item))
+            if not tokens:
+                continue
+            fingerprint = exact_fingerprint(tokens)
+            signature = minhash(tokens) if len(tokens) >= MIN_NEAR_DUP_TOKENS else None
+
+            entry_id = self._find(fingerprint, signature)
+            if entry_id is not None:
+                canonical = self._entries[entry_id][0]
+                self._merge(canonical, item)
+                if entry_id in batch_ids:
+                    collapsed += 1
+                else:
+                    suppressed += 1
+                    suppressed_keys.append({
+                        'item_key': item_key(item),
+                        'source_name': item.get('source_name', ''),
+                        'sentiment_id': canonical.get('sentiment_id')
+                    })
+                continue
+
+            item['sources'] = [_source_entry(item)]
+            item['item_keys'] = [item_key(item)]
+            item['duplicate_count'] = 0
+            item['fingerprint'] = fingerprint
+            self._add(item, fingerprint, signature, now)
+            batch_ids.add(self._next_id - 1)
+            unique.append(item)
+
+        order = {id(item): index for index, item in enumerate(items)}
+        unique.sort(key=lambda i: order[id(i)])
+
+        self.last_suppressed = suppressed_keys
+        self.last_stats = {
+            'input': len(items),
+            'unique': len(unique),
+            'collapsed': collapsed,
+            'already_seen': suppressed,
+            'index_size': len(self._entries)
+        }
+        if collapsed or suppressed:
+            logger.info(f"🧬 Dedup: {len(items)} elementi -> {len(unique)} unici "
+                        f"({collapsed} duplicati nel ciclo, {suppressed} già visti)")
+        return unique
+
+
+if __name__ == "__main__":
+    story = ("Federal Reserve officials signaled they are prepared to keep interest rates higher for longer "
+             "as inflation remains sticky, sending Treasury yields up and equities lower on Wednesday")
+    items = [
+        {'title': 'Fed signals higher for longer', 'summary': story, 'source_name': 'Reuters', 'priority': 1},
+        {'title': 'Fed signals higher for longer', 'summary': story + '.', 'source_name': 'MarketWatch', 'priority': 2},
+        {'title': 'Fed signals higher-for-longer', 'summary': story.replace('Wednesday', 'Wed'),
+         'source_name': 'WSJ', 'priority': 2},
+        {'message': story, 'title': 'Fed signals higher for longer', 'source_name': 'Telegram', 'priority': 1},
+        {'title': 'Oil jumps on supply cuts', 'summary': 'Crude futures rallied after OPEC+ extended output cuts '
+         'into next quarter, lifting energy shares', 'source_name': 'Reuters', 'priority': 1},
+    ]
+    dedup = ArticleDeduplicator()
+    for item in dedup.deduplicate(items):
+        print(item['title'], '->', [s['source_name'] for s in item['sources']])
+    print(dedup.last_stats)
@@ -0,0 +1,183 @@
+"""
+html_extract.py - Parsing HTML mirato (parser compilato, solo i sottoalberi utili, limite in byte)
+"""
+import re
+from typing import Iterable, List, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from utils.logger import setup_logger
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = setup_logger(__name__)
+
+# Oltre questa soglia il resto della pagina non viene né scaricato né parsato
+DEFAULT_MAX_BYTES = 512 * 1024
+
+ARTICLE_CLASS_RE = re.compile(r'(article|post|news|story)', re.I)
+HEADING_TAGS = ['h1', 'h2', 'h3']
+NOISE_TAGS = ['script', 'style', 'nav', 'footer', 'header']
+
+# Contenitori del testo di un articolo, in ordine di preferenza
+CONTENT_SELECTORS = ['article', 'main', '.content', '.post-content', '.article-content', '[role="main"]']
+CONTENT_XPATHS = [
+    '//article',
+    '//main',
+    '//*[contains(concat(" ", normalize-space(@class), " "), " content ")]',
+    '//*[contains(concat(" ", normalize-space(@class), " "), " post-content ")]',
+    '//*[contains(concat(" ", normalize-space(@class), " "), " article-content ")]',
+    '//*[@role="main"]'
+]
+
+HTML_PARSER = 'lxml' if LXML_AVAILABLE else 'html.parser'
+if not LXML_AVAILABLE:
+    logger.warning("⚠️ lxml non installato: parsing HTML con html.parser (più lento)")
+
+
+def charset_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """Charset esplicito di un header Content-Type (None se assente)"""
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset' and value.strip():
+            return value.strip().strip('"\'')
+    return None
+
+
+def read_capped(chunks: Iterable[bytes], max_bytes: Optional[int] = DEFAULT_MAX_BYTES) -> bytes:
+    """Concatena i chunk di una risposta in streaming fermandosi a max_bytes"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        if max_bytes and len(buffer) >= max_bytes:
+            return bytes(buffer[:max_bytes])
+    return bytes(buffer)
+
+
+def find_article_elements(content: bytes, max_articles: int, encoding: Optional[str] = None) -> List:
+    """
+    Blocchi articolo di una homepage: costruisce solo i sottoalberi
+    article/div con classe article|post|news|story (fallback sui titoli).
+    encoding è il charset della risposta HTTP, se dichiarato
+    """
+    strainer = SoupStrainer(['article', 'div'], class_=ARTICLE_CLASS_RE)
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=strainer, from_encoding=encoding)
+    elements = soup.find_all(['article', 'div'], class_=ARTICLE_CLASS_RE)
+
+    if not elements:
+        soup = BeautifulSoup(content, HTML_PARSER, parse_only=SoupStrainer(HEADING_TAGS), from_encoding=encoding)
+        elements = soup.find_all(HEADING_TAGS)
+
+    return elements[:max_articles]
+
+
+def _html_parser(encoding: Optional[str]):
+    """Parser lxml con il charset dell'header (senza: meta charset o rilevamento di lxml)"""
+    if not encoding:
+        return None
+    try:
+        return lxml.html.HTMLParser(encoding=encoding)
+    except LookupError:
+        logger.debug(f"Charset {encoding} non riconosciuto, rilevamento automatico")
+        return None
+
+
+def extract_text(content: bytes, max_chars: int = 10000, encoding: Optional[str] = None) -> str:
+    """Testo principale di una pagina articolo (senza script, menu, header e footer)"""
+    if not content:
+        return ""
+    if not LXML_AVAILABLE:
+        return _extract_text_soup(content, max_chars, encoding)
+
+    try:
+        tree = lxml.html.fromstring(content, parser=_html_parser(encoding))
+    except (etree.ParserError, ValueError):
+        return ""
+
+    etree.strip_elements(tree, *NOISE_TAGS, etree.Comment, with_tail=False)
+
+    element = tree
+    for xpath in CONTENT_XPATHS:
+        matches = tree.xpath(xpath)
+        if matches:
+            element = matches[0]
+            break
+
+    # Un nodo di testo per volta: <p>a</p><p>b</p> diventa "a b", non "ab"
+    text = ' '.join(' '.join(element.itertext()).split())
+    return text[:max_chars]
+
+
+def _extract_text_soup(content: bytes, max_chars: int, encoding: Optional[str] = None) -> str:
+    soup = BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+    for noise in soup(NOISE_TAGS):
+        noise.decompose()
+
+    element = None
+    for selector in CONTENT_SELECTORS:
+        element = soup.select_one(selector)
+        if element:
+            break
+
+    text = (element or soup).get_text(separator=' ', strip=True)
+    return ' '.join(text.split())[:max_chars]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from pathlib import Path
+
+    def legacy_articles(content):
+        soup = BeautifulSoup(content, 'html.parser')
+        elements = soup.find_all(['article', 'div'], class_=ARTICLE_CLASS_RE)
+        return elements or soup.find_all(HEADING_TAGS)
+
+    def legacy_text(content):
+        return _extract_text_soup(content, 10000)
+
+    def synthetic_homepage(size=2 * 1024 * 1024):
+        block = (
+            '<nav><ul>' + ''.join(f'<li><a href="/s{i}">Sezione {i}</a></li>' for i in range(30)) + '</ul></nav>'
+            '<script>var tracking = {"a": 1, "b": [1, 2, 3]};</script>'
+            '<div class="story-card"><h2><a href="/news/{n}">Markets rally as VIX drops {n}</a></h2>'
+            '<p class="summary">Stocks climbed while options flow turned bullish.</p>'
+            '<span class="date">2024-01-10</span></div>'
+            '<div class="ad-slot"><p>' + 'lorem ipsum ' * 40 + '</p></div>'
+        )
+        parts, n = [], 0
+        while sum(len(p) for p in parts) < size:
+            parts.append(block.replace('{n}', str(n)))
+            n += 1
+        return ('<html><head><title>Home</title></head><body><main>' + ''.join(parts) +
+                '</main><footer>fine</footer></body></html>').encode()
+
+    # Benchmark: python -m data.html_extract [file.html ...]
+    fixtures = {path: Path(path).read_bytes() for path in sys.argv[1:]} or {'synthetic-2MB': synthetic_homepage()}
+    runs = 5
+
+    def bench(func, content):
+        start = time.perf_counter()
+        for _ in range(runs):
+            func(content)
+        return (time.perf_counter() - start) / runs * 1000
+
+    # Parser a confronto sullo stesso input (pagina intera); le righe "cap"
+    # mostrano a parte il guadagno del limite in byte applicato in download
+    for name, content in fixtures.items():
+        capped = content[:DEFAULT_MAX_BYTES]
+        rows = [
+            ('articoli html.parser', bench(legacy_articles, content)),
+            (f'articoli {HTML_PARSER} + strainer', bench(lambda c: find_article_elements(c, 10), content)),
+            (f'articoli {HTML_PARSER} + strainer (cap {DEFAULT_MAX_BYTES // 1024}KB)',
+             bench(lambda c: find_article_elements(c, 10), capped)),
+            ('testo html.parser + decompose', bench(legacy_text, content)),
+            (f'testo {HTML_PARSER}', bench(extract_text, content)),
+            (f'testo {HTML_PARSER} (cap {DEFAULT_MAX_BYTES // 1024}KB)', bench(extract_text, capped)),
+        ]
+        print(f"\n{name} ({len(content) / 1024:.0f} KB)")
+        for label, ms in rows:
+            print(f"  {label:<45} {ms:8.1f} ms")
@@ -0,0 +1,128 @@
+"""
+http_cache.py - Validatori HTTP persistenti (ETag / Last-Modified) per feed e siti
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_HTTP_CACHE_PATH = "data/cache/http_cache.db"
+
+
+class HTTPCacheStore:
+    """
+    Per ogni URL memorizza ETag, Last-Modified e il risultato già parsato
+    dell'ultima risposta 200. Le richieste successive inviano
+    If-None-Match / If-Modified-Since e, su 304, riusano il risultato senza
+    riscaricare né riparsare. Lo store sopravvive ai riavvii (SQLite).
+    """
+
+    def __init__(self, path=DEFAULT_HTTP_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                payload TEXT NOT NULL,
+                body_bytes INTEGER NOT NULL,
+                parse_seconds REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self.start_cycle()
+
+    def start_cycle(self):
+        """Azzera i contatori del ciclo di fetch"""
+        with self._lock:
+            self._cycle = {
+                'requests': 0,
+                'not_modified': 0,
+                'bytes_downloaded': 0,
+                'bytes_saved': 0,
+                'parse_seconds': 0.0,
+                'parse_seconds_saved': 0.0
+            }
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, payload, body_bytes, parse_seconds FROM http_cache WHERE url = ?',
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'url': url,
+            'etag': row[0],
+            'last_modified': row[1],
+            'payload': json.loads(row[2]),
+            'body_bytes': row[3],
+            'parse_seconds': row[4]
+        }
+
+    @staticmethod
+    def conditional_headers(cached: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Header condizionali per la richiesta successiva"""
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def record_not_modified(self, cached: Dict[str, Any]):
+        """Risposta 304: conta byte e tempo di parsing risparmiati"""
+        with self._lock:
+            self._cycle['requests'] += 1
+            self._cycle['not_modified'] += 1
+            self._cycle['bytes_saved'] += cached['body_bytes']
+            self._cycle['parse_seconds_saved'] += cached['parse_seconds']
+            self._conn.execute('UPDATE http_cache SET updated_at = ? WHERE url = ?', (time.time(), cached['url']))
+            self._conn.commit()
+
+    def store(self, url: str, headers: Mapping[str, str], payload: Any, body_bytes: int, parse_seconds: float):
+        """Risposta 200: salva validatori e risultato parsato"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+
+        with self._lock:
+            self._cycle['requests'] += 1
+            self._cycle['bytes_downloaded'] += body_bytes
+            self._cycle['parse_seconds'] += parse_seconds
+            if not etag and not last_modified:
+                # Senza validatori il server non potrà mai rispondere 304
+                return
+            self._conn.execute(
+                'INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, json.dumps(payload, default=str),
+                 body_bytes, parse_seconds, time.time())
+            )
+            self._conn.commit()
+
+    def get_cycle_stats(self) -> Dict[str, Any]:
+        """Byte scaricati/risparmiati e tempo di parsing del ciclo corrente"""
+        with self._lock:
+            stats = dict(self._cycle)
+        stats['parse_seconds'] = round(stats['parse_seconds'], 4)
+        stats['parse_seconds_saved'] = round(stats['parse_seconds_saved'], 4)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM http_cache')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,288 @@
+"""
+option_chain.py - Rappresentazione colonnare della catena opzioni
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from analysis.greeks import black_scholes_greeks, time_to_expiry
+
+# Colonne standard di ogni lato della catena
+CHAIN_COLUMNS = [
+    'strike', 'lastPrice', 'bid', 'ask', 'volume', 'open_interest',
+    'implied_volatility', 'contractSymbol', 'delta', 'gamma', 'vega',
+    'theta', 'option_type'
+]
+
+# Rinomina colonne yfinance -> nomi usati dagli analizzatori
+YFINANCE_COLUMNS = {
+    'openInterest': 'open_interest',
+    'impliedVolatility': 'implied_volatility'
+}
+
+NUMERIC_COLUMNS = ['strike', 'lastPrice', 'bid', 'ask', 'volume',
+                   'open_interest', 'implied_volatility', 'delta', 'gamma',
+                   'vega', 'theta']
+
+GREEK_COLUMNS = ['delta', 'gamma', 'vega', 'theta']
+
+
+def _normalize_side(frame, option_type):
+    """Normalizza un DataFrame di un lato (call o put) sulle colonne standard"""
+    if frame is None or len(frame) == 0:
+        frame = pd.DataFrame(columns=CHAIN_COLUMNS)
+    else:
+        frame = frame.rename(columns=YFINANCE_COLUMNS)
+
+    frame = frame.copy()
+    for column in NUMERIC_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = 0.0
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(0.0)
+
+    if 'contractSymbol' not in frame.columns:
+        frame['contractSymbol'] = ''
+    frame['option_type'] = option_type
+
+    extra = [c for c in frame.columns if c not in CHAIN_COLUMNS]
+    return frame[CHAIN_COLUMNS + extra].reset_index(drop=True)
+
+
+class OptionChain:
+    """
+    Catena opzioni per una scadenza: un DataFrame per le call e uno per le put,
+    più i metadati di mercato. La vista dict legacy è disponibile con to_dict().
+    """
+
+    def __init__(self, calls=None, puts=None, spot_price=0.0, expiration=None,
+                 ticker=None, timestamp=None, vix_data=None, market_return=0.0):
+        self.calls = _normalize_side(calls, 'call')
+        self.puts = _normalize_side(puts, 'put')
+        self.spot_price = float(spot_price or 0)
+        self.expiration = expiration
+        self.ticker = ticker
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.vix_data = vix_data or {}
+        self.market_return = market_return
+        # ChainChangeSet rispetto allo snapshot precedente (impostato dal fetcher)
+        self.changes = None
+
+    @classmethod
+    def from_dict(cls, options_data):
+        """Costruisce la catena dal formato dict legacy (liste di contratti)"""
+        return cls(
+            calls=pd.DataFrame(options_data.get('calls', [])),
+            puts=pd.DataFrame(options_data.get('puts', [])),
+            spot_price=options_data.get('spot_price', 0),
+            expiration=options_data.get('expiration'),
+            ticker=options_data.get('ticker'),
+            timestamp=options_data.get('timestamp'),
+            vix_data=options_data.get('vix_data', {}),
+            market_return=options_data.get('market_return', 0.0)
+        )
+
+    @classmethod
+    def coerce(cls, data):
+        """Accetta una OptionChain o un dict legacy e restituisce una OptionChain"""
+        if isinstance(data, cls):
+            return data
+        if isinstance(data, dict) and isinstance(data.get('chain'), cls):
+            return data['chain']
+        return cls.from_dict(data or {})
+
+    def side(self, option_type):
+        """DataFrame del lato richiesto ('call'/'calls' o 'put'/'puts')"""
+        return self.calls if option_type.startswith('call') else self.puts
+
+    def apply_greeks(self, rate=0.0, dividend_yield=0.0, now=None):
+        """
+        Calcola delta, gamma, vega e theta Black-Scholes per entrambi i lati
+        in un unico passaggio vettorizzato, con il tempo reale a scadenza
+        """
+        if not self.expiration or len(self) == 0:
+            return self
+
+        n_calls = len(self.calls)
+        greeks = black_scholes_greeks(
+            spot=self.spot_price,
+            strike=np.concatenate([self.calls['strike'].to_numpy(), self.puts['strike'].to_numpy()]),
+            time_to_expiry=time_to_expiry(self.expiration, now)[0],
+            iv=np.concatenate([self.calls['implied_volatility'].to_numpy(),
+                               self.puts['implied_volatility'].to_numpy()]),
+            is_call=np.arange(len(self)) < n_calls,
+            rate=rate,
+            dividend_yield=dividend_yield
+        )
+        for column in GREEK_COLUMNS:
+            self.calls[column] = greeks[column][:n_calls]
+            self.puts[column] = greeks[column][n_calls:]
+        return self
+
+    def __len__(self):
+        return len(self.calls) + len(self.puts)
+
+    def _positive_by_strike(self, column):
+        result = {}
+        for key, frame in (('calls', self.calls), ('puts', self.puts)):
+            mask = frame[column].to_numpy() > 0
+            strikes = frame['strike'].to_numpy()[mask]
+            values = frame[column].to_numpy()[mask]
+            result[key] = dict(zip(strikes.tolist(), values.tolist()))
+        return result
+
+    @property
+    def volume_data(self):
+        """Vista {strike: volume} per lato, solo strike con volume > 0"""
+        return self._positive_by_strike('volume')
+
+    @property
+    def oi_data(self):
+        """Vista {strike: open interest} per lato, solo strike con OI > 0"""
+        return self._positive_by_strike('open_interest')
+
+    def totals(self):
+        """Somme di volume e OI per lato, calcolate sulle colonne"""
+        return {
+            'call_volume': float(self.calls['volume'].sum()),
+            'put_volume': float(self.puts['volume'].sum()),
+            'call_oi': float(self.calls['open_interest'].sum()),
+            'put_oi': float(self.puts['open_interest'].sum())
+        }
+
+    def to_frame(self):
+        """Call e put in un unico DataFrame (colonna option_type)"""
+        return pd.concat([self.calls, self.puts], ignore_index=True)
+
+    def to_dict(self):
+        """Vista dict legacy per i vecchi chiamanti"""
+        return {
+            'spot_price': self.spot_price,
+            'expiration': self.expiration,
+            'calls': self.calls.to_dict('records'),
+            'puts': self.puts.to_dict('records'),
+            'volume_data': self.volume_data,
+            'oi_data': self.oi_data,
+            'vix_data': self.vix_data,
+            'market_return': self.market_return,
+            'timestamp': self.timestamp,
+            'ticker': self.ticker,
+            'chain': self
+        }
+
+
+def nearest_by_abs_delta(frame, target_delta, tolerance=0.05):
+    """Riga con |delta| più vicino al target entro la tolleranza, o None"""
+    if frame.empty:
+        return None
+    distance = np.abs(np.abs(frame['delta'].to_numpy()) - target_delta)
+    idx = int(np.argmin(distance))
+    if distance[idx] >= tolerance:
+        return None
+    return frame.iloc[idx]
+
+
+class OptionSurface:
+    """
+    Superficie opzioni: tutte le scadenze di un ticker, una OptionChain per
+    scadenza, con spot/VIX/ritorno di mercato condivisi.
+    """
+
+    def __init__(self, chains, ticker=None, spot_price=0.0, vix_data=None,
+                 market_return=0.0, timestamp=None, errors=None):
+        self.chains = {expiration: chains[expiration] for expiration in sorted(chains)}
+        self.ticker = ticker
+        self.spot_price = float(spot_price or 0)
+        self.vix_data = vix_data or {}
+        self.market_return = market_return
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.errors = errors or {}
+
+    @property
+    def expirations(self):
+        return list(self.chains)
+
+    @property
+    def contract_count(self):
+        return sum(len(chain) for chain in self.chains.values())
+
+    def __getitem__(self, expiration):
+        return self.chains[expiration]
+
+    def __contains__(self, expiration):
+        return expiration in self.chains
+
+    def __iter__(self):
+        return iter(self.chains)
+
+    def __len__(self):
+        return len(self.chains)
+
+    def items(self):
+        return self.chains.items()
+
+    def to_frame(self):
+        """Tutti i contratti della superficie in un DataFrame (colonna expiration)"""
+        frames = []
+        for expiration, chain in self.chains.items():
+            frame = chain.to_frame()
+            frame['expiration'] = expiration
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=CHAIN_COLUMNS + ['expiration'])
+        return pd.concat(frames, ignore_index=True)
+
+    def apply_greeks(self, rate=0.0, dividend_yield=0.0, now=None):
+        """
+        Greche su tutte le scadenze in un unico passaggio vettorizzato: il tempo
+        a scadenza si calcola una volta per scadenza e le quattro colonne delle
+        greche si scrivono con una sola assegnazione per lato
+        """
+        if self.contract_count == 0:
+            return self
+
+        sides = [side for chain in self.chains.values() for side in (chain.calls, chain.puts)]
+        sizes = [len(side) for side in sides]
+        # Lati in ordine (call, put) per scadenza: tempo e tipo ripetuti sui contratti
+        years = time_to_expiry(list(self.chains), now)
+        greeks = black_scholes_greeks(
+            spot=self.spot_price,
+            strike=np.concatenate([side['strike'].to_numpy() for side in sides]),
+            time_to_expiry=np.repeat(np.repeat(years, 2), sizes),
+            iv=np.concatenate([side['implied_volatility'].to_numpy() for side in sides]),
+            is_call=np.repeat(np.tile([True, False], len(self.chains)), sizes),
+            rate=rate,
+            dividend_yield=dividend_yield
+        )
+
+        values = np.column_stack([greeks[column] for column in GREEK_COLUMNS])
+        offset = 0
+        for side, size in zip(sides, sizes):
+            if size:
+                side[GREEK_COLUMNS] = values[offset:offset + size]
+            offset += size
+        return self
+
+
+if __name__ == "__main__":
+    import time
+
+    # Benchmark: superficie di 20 scadenze x 250 strike x 2 lati = 10k contratti
+    rng = np.random.default_rng(0)
+    expirations = pd.date_range(datetime.now(), periods=20, freq='7D').strftime('%Y-%m-%d')
+    strikes = np.arange(300.0, 550.0, 1.0)
+
+    def random_side():
+        return pd.DataFrame({'strike': strikes, 'impliedVolatility': rng.uniform(0.1, 0.6, len(strikes))})
+
+    surface = OptionSurface(
+        {expiration: OptionChain(calls=random_side(), puts=random_side(), spot_price=450.0,
+                                 expiration=expiration, ticker='SPY') for expiration in expirations},
+        ticker='SPY', spot_price=450.0
+    )
+
+    surface.apply_greeks(rate=0.045)
+    runs = 50
+    start = time.perf_counter()
+    for _ in range(runs):
+        surface.apply_greeks(rate=0.045)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"OptionSurface.apply_greeks per {surface.contract_count} contratti: {elapsed * 1000:.2f} ms")
@@ -1,249 +1,327 @@
 """
-options_fetcher.py - Fetch dati opzioni da Yahoo Finance
+options_fetcher.py - Fetch dati opzioni tramite provider (default Yahoo Finance)
 """
-import yfinance as yf
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from data.chain_diff import ChainDiffer, IncrementalChainAggregates
+from data.chain_store import ChainDiskCache
+from data.option_chain import OptionChain, OptionSurface
+from data.providers import create_provider, get_default_provider
+from utils.cache import TTLCache
+from utils.resilience import DataSourceError
 from utils.logger import setup_logger
 import time
 
 logger = setup_logger(__name__)
 
+# Parametri di default per le greche (sovrascrivibili da config analysis.greeks)
+DEFAULT_RISK_FREE_RATE = 0.045
+DEFAULT_DIVIDEND_YIELD = 0.0
+
+# Thread massimi per il fetch concorrente delle scadenze
+DEFAULT_SURFACE_WORKERS = 4
+
+# Cache quote/storico condivisa da tutti gli OptionsFetcher del processo
+# (TTL di default; from_config lo allinea a data_sources.market_data.update_interval)
+QUOTE_CACHE_TTL = 60
+QUOTE_CACHE_SIZE = 256
+QUOTE_CACHE = TTLCache(max_size=QUOTE_CACHE_SIZE, ttl=QUOTE_CACHE_TTL)
+
+def get_history(symbol, period="5d", provider=None):
+    """Storico prezzi dalla cache condivisa: un download per simbolo/periodo per TTL"""
+    provider = provider or get_default_provider()
+    return QUOTE_CACHE.get_or_load(
+        (provider.name, symbol, period),
+        lambda: provider.get_history(symbol, period)
+    )
+
+def configure_quote_cache(config=None):
+    """TTL della cache quote da data_sources.market_data.update_interval"""
+    market_config = (config or {}).get('data_sources', {}).get('market_data', {}) or {}
+    QUOTE_CACHE.ttl = float(market_config.get('update_interval', QUOTE_CACHE_TTL))
+    return QUOTE_CACHE.ttl
+
+def get_quote_cache_stats():
+    """Contatori hit/miss della cache quote condivisa"""
+    return QUOTE_CACHE.get_stats()
+
+def fetch_vix_data(provider=None):
+    """Fetch dati VIX (ultimi 5 giorni); DataSourceError se non disponibili"""
+    provider = provider or get_default_provider()
+    try:
+        vix_history = get_history("^VIX", period="5d", provider=provider)
+    except DataSourceError:
+        raise
+    except Exception as e:
+        raise DataSourceError(provider.name, f"VIX non disponibile: {e}") from e
+    
+    if vix_history.empty:
+        raise DataSourceError(provider.name, "storico VIX vuoto")
+    
+    current = vix_history['Close'].iloc[-1]
+    previous = vix_history['Close'].iloc[-2] if len(vix_history) > 1 else current
+    week_ago = vix_history['Close'].iloc[0] if len(vix_history) > 4 else current
+    
+    return {
+        'available': True,
+        'current': float(current),
+        'previous': float(previous),
+        'week_ago': float(week_ago),
+        'change': float(current - previous)
+    }
+
+def vix_unavailable(reason):
+    """Segnaposto esplicito per VIX non disponibile (nessun valore inventato)"""
+    return {'available': False, 'error': str(reason)}
+
+def get_vix_context(provider=None):
+    """
+    VIX per il contesto di mercato di una catena: se il fetch fallisce la
+    catena viene comunque prodotta, con vix_data marcato come non disponibile
+    """
+    try:
+        return fetch_vix_data(provider)
+    except DataSourceError as e:
+        logger.warning(f"⚠️ VIX non disponibile: {e}")
+        return vix_unavailable(e)
+
 class OptionsFetcher:
-    def __init__(self, ticker="SPY", api_key=None):
+    def __init__(self, ticker="SPY", api_key=None, risk_free_rate=DEFAULT_RISK_FREE_RATE,
+                 dividend_yield=DEFAULT_DIVIDEND_YIELD, provider=None, disk_cache=None):
         self.ticker = ticker
         self.api_key = api_key
-        self.ticker_obj = yf.Ticker(ticker)
+        self.risk_free_rate = risk_free_rate
+        self.dividend_yield = dividend_yield
+        # Provider dati (yfinance, registrazione o replay offline)
+        self.provider = provider or get_default_provider()
+        # Cache Parquet opzionale: catene del bucket corrente lette da disco
+        self.disk_cache = disk_cache
+        # Snapshot precedente per scadenza e aggregati aggiornati dai change set
+        self.differ = ChainDiffer()
+        self.aggregates = IncrementalChainAggregates()
+    
+    @classmethod
+    def from_config(cls, ticker, config, **kwargs):
+        """Crea il fetcher leggendo i parametri delle greche da config.yaml"""
+        greeks_config = config.get('analysis', {}).get('greeks', {})
+        dividend_yields = greeks_config.get('dividend_yields', {}) or {}
+        configure_quote_cache(config)
+        if kwargs.get('provider') is None:
+            kwargs['provider'] = create_provider(config)
+        if kwargs.get('disk_cache') is None:
+            kwargs['disk_cache'] = ChainDiskCache.from_config(config)
+        return cls(
+            ticker,
+            risk_free_rate=greeks_config.get('risk_free_rate', DEFAULT_RISK_FREE_RATE),
+            dividend_yield=dividend_yields.get(ticker, greeks_config.get('dividend_yield', DEFAULT_DIVIDEND_YIELD)),
+            **kwargs
+        )
         
     def fetch_options_data(self, expiration_date=None):
         """
         Fetch dati opzioni con struttura necessaria per gli analizzatori
+        (vista dict legacy di fetch_chain)
+        """
+        return self.fetch_chain(expiration_date).to_dict()
+    
+    def fetch_chain(self, expiration_date=None, vix_data=None, timestamp=None):
+        """
+        Fetch della catena opzioni in formato colonnare (OptionChain).
+        vix_data e timestamp possono essere forniti dal chiamante (fetch batch)
+        per condividerli tra più ticker.
+        In caso di errore solleva DataSourceError (nessun fallback a dati mock).
         """
         try:
             logger.info(f"Fetching options data for {self.ticker}")
             
-            # Ottieni dati spot
-            spot_data = self.ticker_obj.history(period="1d")
-            spot_price = spot_data['Close'].iloc[-1] if not spot_data.empty else 0
-            
             # Ottieni date di scadenza disponibili
             if expiration_date is None:
-                expirations = self.ticker_obj.options
-                if not expirations:
-                    raise ValueError(f"Nessuna scadenza disponibile per {self.ticker}")
+                expirations = self._get_expirations()
                 expiration_date = expirations[0]  # Prendi la prima scadenza
+                self._evict_stale(expirations)
             
-            logger.info(f"Usando scadenza: {expiration_date}")
-            
-            # Ottieni catena opzioni
-            try:
-                opt_chain = self.ticker_obj.option_chain(expiration_date)
-            except Exception as e:
-                logger.error(f"Errore fetch opzioni: {e}")
-                # Fallback a dati mock per sviluppo
-                return self._get_mock_data(spot_price)
-            
-            # Processa calls
-            calls = []
-            if not opt_chain.calls.empty:
-                for _, row in opt_chain.calls.iterrows():
-                    call = {
-                        'strike': row['strike'],
-                        'lastPrice': row['lastPrice'],
-                        'bid': row['bid'],
-                        'ask': row['ask'],
-                        'volume': row['volume'],
-                        'open_interest': row['openInterest'],
-                        'implied_volatility': row['impliedVolatility'],
-                        'contractSymbol': row['contractSymbol'],
-                        'delta': self._estimate_delta(row, 'call', spot_price),
-                        'option_type': 'call'
-                    }
-                    calls.append(call)
+            # Catena già salvata su disco nel bucket corrente
+            cached = self._load_cached(expiration_date)
+            if cached is not None:
+                self._track_changes(cached)
+                return cached
             
-            # Processa puts
-            puts = []
-            if not opt_chain.puts.empty:
-                for _, row in opt_chain.puts.iterrows():
-                    put = {
-                        'strike': row['strike'],
-                        'lastPrice': row['lastPrice'],
-                        'bid': row['bid'],
-                        'ask': row['ask'],
-                        'volume': row['volume'],
-                        'open_interest': row['openInterest'],
-                        'implied_volatility': row['impliedVolatility'],
-                        'contractSymbol': row['contractSymbol'],
-                        'delta': self._estimate_delta(row, 'put', spot_price),
-                        'option_type': 'put'
-                    }
-                    puts.append(put)
-            
-            # Calcola metriche aggregati per volume e OI
-            volume_data = {
-                'calls': {c['strike']: c['volume'] for c in calls if c['volume'] > 0},
-                'puts': {p['strike']: p['volume'] for p in puts if p['volume'] > 0}
-            }
-            
-            oi_data = {
-                'calls': {c['strike']: c['open_interest'] for c in calls if c['open_interest'] > 0},
-                'puts': {p['strike']: p['open_interest'] for p in puts if p['open_interest'] > 0}
-            }
+            # Dati spot, VIX e performance mercato
+            market_context = self._fetch_market_context(vix_data, timestamp)
             
-            # Ottieni dati VIX (per SPY) o volatilità equivalente
-            vix_data = self._fetch_vix_data()
+            logger.info(f"Usando scadenza: {expiration_date}")
             
-            # Ottieni performance mercato
-            market_return = self._calculate_market_return()
+            # Ottieni catena opzioni
+            chain = self._fetch_expiration(expiration_date, market_context)
             
-            return {
-                'spot_price': spot_price,
-                'expiration': expiration_date,
-                'calls': calls,
-                'puts': puts,
-                'volume_data': volume_data,
-                'oi_data': oi_data,
-                'vix_data': vix_data,
-                'market_return': market_return,
-                'timestamp': datetime.now().isoformat(),
-                'ticker': self.ticker
-            }
+            # Greche Black-Scholes sull'intera catena con il tempo reale a scadenza
+            chain.apply_greeks(self.risk_free_rate, self.dividend_yield)
+            self._track_changes(chain)
+            if self.disk_cache is not None:
+                self.disk_cache.save(chain)
+            return chain
             
+        except DataSourceError as e:
+            logger.error(f"❌ Errore fetch opzioni {self.ticker}: {e}")
+            raise
         except Exception as e:
-            logger.error(f"Errore in fetch_options_data: {e}")
-            # Return mock data in caso di errore
-            return self._get_mock_data(100)
+            logger.error(f"❌ Errore in fetch_chain {self.ticker}: {e}")
+            raise DataSourceError(self.provider.name, f"fetch {self.ticker} fallito: {e}") from e
     
-    def _estimate_delta(self, option_row, option_type, spot_price):
-        """Stima delta usando Black-Scholes semplificato"""
-        try:
-            # Questa è una stima semplificata - in produzione usa una libreria proper
-            strike = option_row['strike']
-            iv = option_row['impliedVolatility']
-            time_to_expiry = 30 / 365  # Approssimazione 30 giorni
-            
-            if spot_price == 0 or iv == 0:
-                return 0.5 if option_type == 'call' else -0.5
-            
-            # Approssimazione molto semplificata del delta
-            if option_type == 'call':
-                if strike < spot_price:
-                    return 0.6 + (spot_price - strike) / spot_price * 0.3
-                else:
-                    return 0.4 - (strike - spot_price) / spot_price * 0.3
-            else:  # put
-                if strike < spot_price:
-                    return -0.4 + (spot_price - strike) / spot_price * 0.3
-                else:
-                    return -0.6 - (strike - spot_price) / spot_price * 0.3
-                    
-        except:
-            return 0.5 if option_type == 'call' else -0.5
+    def fetch_surface(self, expirations=None, max_workers=DEFAULT_SURFACE_WORKERS,
+                      vix_data=None, timestamp=None):
+        """
+        Fetch di tutte le scadenze quotate (o di quelle indicate) tramite un
+        thread pool limitato, unite in una OptionSurface indicizzata per scadenza.
+        Spot, VIX e storico vengono scaricati una sola volta per tutte le scadenze.
+        """
+        start = time.perf_counter()
+        logger.info(f"Fetching options surface for {self.ticker}")
+        
+        market_context = self._fetch_market_context(vix_data, timestamp)
+        if expirations is None:
+            expirations = self._get_expirations()
+            self._evict_stale(expirations)
+        else:
+            self._evict_stale()
+        
+        chains = {}
+        errors = {}
+        
+        # Scadenze già su disco nel bucket corrente: nessun download
+        for expiration in expirations:
+            cached = self._load_cached(expiration)
+            if cached is not None:
+                chains[expiration] = cached
+        to_fetch = [expiration for expiration in expirations if expiration not in chains]
+        fetched = set()
+        
+        workers = max(1, min(max_workers, len(to_fetch)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"surface-{self.ticker}") as executor:
+            futures = {
+                executor.submit(self._fetch_expiration, expiration, market_context): expiration
+                for expiration in to_fetch
+            }
+            for future in as_completed(futures):
+                expiration = futures[future]
+                try:
+                    chains[expiration] = future.result()
+                    fetched.add(expiration)
+                except Exception as e:
+                    logger.warning(f"Errore fetch scadenza {expiration} per {self.ticker}: {e}")
+                    errors[expiration] = str(e)
+        
+        if not chains and errors:
+            raise DataSourceError(self.provider.name, f"nessuna scadenza scaricata per {self.ticker}")
+        
+        surface = OptionSurface(
+            chains,
+            ticker=self.ticker,
+            spot_price=market_context['spot_price'],
+            vix_data=market_context['vix_data'],
+            market_return=market_context['market_return'],
+            timestamp=market_context['timestamp'],
+            errors=errors
+        )
+        
+        # Greche per tutta la superficie in un solo passaggio
+        surface.apply_greeks(self.risk_free_rate, self.dividend_yield)
+        for expiration, chain in surface.items():
+            self._track_changes(chain)
+            if self.disk_cache is not None and expiration in fetched:
+                self.disk_cache.save(chain)
+        
+        logger.info(f"✅ Superficie {self.ticker}: {len(chains)}/{len(expirations)} scadenze, "
+                    f"{surface.contract_count} contratti in {time.perf_counter() - start:.2f}s")
+        return surface
     
-    def _fetch_vix_data(self):
-        """Fetch dati VIX"""
+    def _load_cached(self, expiration_date=None):
+        """Catena dal bucket corrente della cache su disco, se presente"""
+        if self.disk_cache is None:
+            return None
+        if expiration_date is None:
+            # La scadenza front è quella quotata, non la prima presente su disco
+            expiration_date = self._get_expirations()[0]
+        return self.disk_cache.load(self.ticker, expiration_date)
+    
+    def _track_changes(self, chain):
+        """Diff con lo snapshot precedente della scadenza e aggiornamento aggregati"""
+        chain.changes = self.differ.diff(chain)
+        self.aggregates.apply(chain.changes, chain.spot_price)
+        return chain.changes
+    
+    def _evict_stale(self, listed=None):
+        """Libera snapshot e aggregati di scadenze passate o non più quotate"""
+        stale = self.differ.evict(self.ticker, listed)
+        self.aggregates.evict(self.ticker, listed)
+        if stale:
+            logger.debug(f"Scadenze {self.ticker} rimosse dal diff: {[key[1] for key in stale]}")
+        return stale
+    
+    def get_aggregates(self, expiration):
+        """Aggregati incrementali (PCR, muri, max pain) di una scadenza già scaricata"""
+        return self.aggregates.get(self.ticker, expiration)
+    
+    def _get_expirations(self):
+        """Scadenze quotate per il ticker (DataSourceError se assenti o non scaricabili)"""
         try:
-            if self.ticker == "SPY":
-                vix = yf.Ticker("^VIX")
-                vix_history = vix.history(period="5d")
-                
-                if not vix_history.empty:
-                    current = vix_history['Close'].iloc[-1]
-                    previous = vix_history['Close'].iloc[-2] if len(vix_history) > 1 else current
-                    week_ago = vix_history['Close'].iloc[0] if len(vix_history) > 4 else current
-                    
-                    return {
-                        'current': float(current),
-                        'previous': float(previous),
-                        'week_ago': float(week_ago),
-                        'change': float(current - previous)
-                    }
+            expirations = self.provider.get_expirations(self.ticker)
+        except DataSourceError:
+            raise
         except Exception as e:
-            logger.warning(f"Errore fetch VIX: {e}")
+            raise DataSourceError(self.provider.name, f"scadenze {self.ticker} non disponibili: {e}") from e
+        if not expirations:
+            raise DataSourceError(self.provider.name, f"nessuna scadenza disponibile per {self.ticker}")
+        return list(expirations)
+    
+    def _fetch_market_context(self, vix_data=None, timestamp=None):
+        """Dati di mercato condivisi da tutte le scadenze di un fetch"""
+        quote = self.get_quote()
         
-        # Fallback values
         return {
-            'current': 18.5,
-            'previous': 17.2,
-            'week_ago': 16.8,
-            'change': 1.3
+            'spot_price': quote['spot_price'],
+            # Dati VIX (o segnaposto esplicito se non disponibili)
+            'vix_data': vix_data if vix_data is not None else self._fetch_vix_data(),
+            # Ottieni performance mercato
+            'market_return': quote['market_return'],
+            'timestamp': timestamp or datetime.now().isoformat()
         }
     
-    def _calculate_market_return(self):
-        """Calcola ritorno di mercato giornaliero"""
-        try:
-            hist = self.ticker_obj.history(period="5d")
-            if len(hist) >= 2:
-                current = hist['Close'].iloc[-1]
-                previous = hist['Close'].iloc[-2]
-                return ((current / previous) - 1) * 100
-        except:
-            pass
-        return 0.0
-    
-    def _get_mock_data(self, spot_price=100):
-        """Dati mock per sviluppo/testing"""
-        logger.info("Usando dati mock per sviluppo")
-        
-        calls = []
-        puts = []
-        
-        # Genera dati mock per calls
-        for i in range(5):
-            strike = spot_price * (0.95 + i * 0.025)
-            calls.append({
-                'strike': strike,
-                'lastPrice': max(0.1, (strike - spot_price) * 0.5),
-                'bid': max(0.1, (strike - spot_price) * 0.45),
-                'ask': max(0.1, (strike - spot_price) * 0.55),
-                'volume': 1000 + i * 500,
-                'open_interest': 5000 + i * 1000,
-                'implied_volatility': 0.2 + i * 0.02,
-                'delta': 0.5 - i * 0.1,
-                'option_type': 'call'
-            })
-        
-        # Genera dati mock per puts
-        for i in range(5):
-            strike = spot_price * (0.95 + i * 0.025)
-            puts.append({
-                'strike': strike,
-                'lastPrice': max(0.1, (spot_price - strike) * 0.5),
-                'bid': max(0.1, (spot_price - strike) * 0.45),
-                'ask': max(0.1, (spot_price - strike) * 0.55),
-                'volume': 1200 + i * 600,
-                'open_interest': 6000 + i * 1200,
-                'implied_volatility': 0.25 + i * 0.03,
-                'delta': -0.5 + i * 0.1,
-                'option_type': 'put'
-            })
-        
-        volume_data = {
-            'calls': {c['strike']: c['volume'] for c in calls},
-            'puts': {p['strike']: p['volume'] for p in puts}
-        }
+    def _fetch_expiration(self, expiration_date, market_context):
+        """Scarica la catena di una scadenza (senza greche)"""
+        calls, puts = self.provider.get_option_chain(self.ticker, expiration_date)
         
-        oi_data = {
-            'calls': {c['strike']: c['open_interest'] for c in calls},
-            'puts': {p['strike']: p['open_interest'] for p in puts}
-        }
+        # I DataFrame grezzi vengono normalizzati sulle colonne (niente dict per riga)
+        return OptionChain(
+            calls=calls,
+            puts=puts,
+            spot_price=market_context['spot_price'],
+            expiration=expiration_date,
+            ticker=self.ticker,
+            timestamp=market_context['timestamp'],
+            vix_data=market_context['vix_data'],
+            market_return=market_context['market_return']
+        )
+    
+    def _fetch_vix_data(self):
+        """VIX come contesto di mercato (stessa cache quote per tutti i ticker)"""
+        return get_vix_context(self.provider)
+    
+    def get_quote(self):
+        """
+        Spot, chiusura precedente e ritorno giornaliero da un unico storico 5d
+        (servito dalla cache condivisa)
+        """
+        hist = get_history(self.ticker, period="5d", provider=self.provider)
+        if hist.empty:
+            raise DataSourceError(self.provider.name, f"storico prezzi vuoto per {self.ticker}")
         
+        current = hist['Close'].iloc[-1]
+        previous = hist['Close'].iloc[-2] if len(hist) >= 2 else current
         return {
-            'spot_price': spot_price,
-            'expiration': '2024-01-19',
-            'calls': calls,
-            'puts': puts,
-            'volume_data': volume_data,
-            'oi_data': oi_data,
-            'vix_data': {
-                'current': 18.5,
-                'previous': 17.2,
-                'week_ago': 16.8,
-                'change': 1.3
-            },
-            'market_return': -1.5,  # Mock: mercato in ribasso del 1.5%
-            'timestamp': datetime.now().isoformat(),
-            'ticker': self.ticker
+            'spot_price': current,
+            'previous_close': previous,
+            'market_return': ((current / previous) - 1) * 100 if previous else 0.0
         }
 
 # Funzione helper per uso rapido
@@ -251,3 +329,8 @@ def fetch_options_snapshot(ticker="SPY", expiration=None):
     """Funzione rapida per fetch dati opzioni"""
     fetcher = OptionsFetcher(ticker)
     return fetcher.fetch_options_data(expiration)
+
+def fetch_options_surface(ticker="SPY", expirations=None):
+    """Funzione rapida per fetch di tutte le scadenze"""
+    fetcher = OptionsFetcher(ticker)
+    return fetcher.fetch_surface(expirations)
@@ -0,0 +1,300 @@
+"""
+providers.py - Provider dati di mercato (yfinance, registrazione e replay offline)
+"""
+import json
+import random
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from datetime import datetime
+import pandas as pd
+import yfinance as yf
+from utils.logger import setup_logger
+from utils.resilience import RateLimitedError, get_source_guard, guard_settings_from_config
+
+logger = setup_logger(__name__)
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # yfinance < 0.2.55
+    YFRateLimitError = None
+
+# Directory di default per le registrazioni
+DEFAULT_RECORD_DIR = "data/recordings"
+
+
+class MarketDataProvider:
+    """
+    Interfaccia di un provider dati: scadenze, catena per scadenza e storico.
+    get_option_chain restituisce la coppia (calls, puts) di DataFrame grezzi.
+    """
+
+    name = "base"
+
+    def get_expirations(self, ticker):
+        raise NotImplementedError
+
+    def get_option_chain(self, ticker, expiration):
+        raise NotImplementedError
+
+    def get_history(self, symbol, period="5d"):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Provider live su Yahoo Finance (un yf.Ticker riutilizzato per simbolo)"""
+
+    name = "yfinance"
+
+    def __init__(self):
+        self._tickers = {}
+        self._lock = threading.Lock()
+
+    def _ticker(self, symbol):
+        with self._lock:
+            if symbol not in self._tickers:
+                self._tickers[symbol] = yf.Ticker(symbol)
+            return self._tickers[symbol]
+
+    def _call(self, func, *args, **kwargs):
+        # Il throttling di Yahoo diventa RateLimitedError, ritentato dal SourceGuard
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if YFRateLimitError is not None and isinstance(e, YFRateLimitError):
+                raise RateLimitedError(self.name, str(e)) from e
+            raise
+
+    def get_expirations(self, ticker):
+        return list(self._call(lambda: self._ticker(ticker).options))
+
+    def get_option_chain(self, ticker, expiration):
+        opt_chain = self._call(self._ticker(ticker).option_chain, expiration)
+        return opt_chain.calls, opt_chain.puts
+
+    def get_history(self, symbol, period="5d"):
+        return self._call(self._ticker(symbol).history, period=period)
+
+
+def _frame_to_json(frame):
+    # orient='table' salva anche lo schema: dtype (float, datetime con tz) e indice tornano identici
+    return frame.to_json(orient='table', date_format='iso')
+
+
+def _frame_from_json(payload):
+    # Le registrazioni precedenti usano orient='split' (senza schema)
+    orient = 'table' if payload.startswith('{"schema"') else 'split'
+    return pd.read_json(StringIO(payload), orient=orient)
+
+
+class RecordingProvider(MarketDataProvider):
+    """
+    Inoltra le chiamate a un provider reale e registra ogni risposta grezza
+    (con latenza) in un file JSONL, rigiocabile con ReplayProvider
+    """
+
+    def __init__(self, inner, record_dir=DEFAULT_RECORD_DIR):
+        self.inner = inner
+        self.name = f"record:{inner.name}"
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.record_dir / f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        logger.info(f"🎙️ Registrazione dati di mercato in {self.path}")
+
+    def _record(self, method, args, call, encode):
+        start = time.monotonic()
+        result = call()
+        latency = time.monotonic() - start
+
+        entry = {
+            'method': method,
+            'args': list(args),
+            'offset': round(start - self._start, 6),
+            'latency': round(latency, 6),
+            'payload': encode(result)
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        return result
+
+    def get_expirations(self, ticker):
+        return self._record('get_expirations', (ticker,),
+                            lambda: self.inner.get_expirations(ticker), list)
+
+    def get_option_chain(self, ticker, expiration):
+        return self._record('get_option_chain', (ticker, expiration),
+                            lambda: self.inner.get_option_chain(ticker, expiration),
+                            lambda chain: [_frame_to_json(chain[0]), _frame_to_json(chain[1])])
+
+    def get_history(self, symbol, period="5d"):
+        return self._record('get_history', (symbol, period),
+                            lambda: self.inner.get_history(symbol, period), _frame_to_json)
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serve offline le risposte registrate da RecordingProvider.
+
+    speed=None risponde subito; speed=1.0 riproduce i tempi registrati
+    (istante della chiamata rispetto all'inizio sessione + latenza),
+    speed=N li accelera di N volte. Le risposte multiple per la stessa
+    chiamata vengono servite in ordine e poi ricominciano da capo, spostate
+    di una durata di sessione per ogni giro.
+    throttle_rate simula il throttling della fonte: quella frazione di
+    chiamate fallisce con RateLimitedError (sequenza deterministica da seed).
+    """
+
+    name = "replay"
+
+    def __init__(self, record_dir=DEFAULT_RECORD_DIR, speed=None, throttle_rate=0.0, seed=0):
+        self.record_dir = Path(record_dir)
+        self.speed = speed
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._responses = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        self._base_offset = 0.0
+        self._span = 0.0
+        self._clock_start = None
+        self._load()
+
+    def _load(self):
+        paths = [self.record_dir] if self.record_dir.is_file() else sorted(self.record_dir.glob('*.jsonl'))
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    key = (entry['method'],) + tuple(entry['args'])
+                    self._responses.setdefault(key, []).append(entry)
+
+        entries = [entry for entries in self._responses.values() for entry in entries]
+        if entries:
+            # Registrazioni senza offset (più vecchie) valgono come chiamate all'istante 0
+            self._base_offset = min(entry.get('offset', 0.0) for entry in entries)
+            self._span = max(entry.get('offset', 0.0) + entry['latency'] for entry in entries) - self._base_offset
+
+        calls = len(entries)
+        logger.info(f"▶️ Replay: {calls} risposte registrate da {len(paths)} file")
+
+    def _next(self, key):
+        with self._lock:
+            entries = self._responses.get(key)
+            if not entries:
+                raise LookupError(f"Nessuna risposta registrata per {key}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            entry = entries[cursor % len(entries)]
+            throttled = self.throttle_rate and self._random.random() < self.throttle_rate
+            if self._clock_start is None:
+                self._clock_start = time.monotonic()
+
+        if self.speed:
+            # Attende l'istante registrato della chiamata, poi la sua latenza
+            lap = cursor // len(entries)
+            offset = entry.get('offset', self._base_offset) - self._base_offset + lap * self._span
+            wait = offset / self.speed - (time.monotonic() - self._clock_start)
+            time.sleep(max(wait, 0.0) + entry['latency'] / self.speed)
+        if throttled:
+            raise RateLimitedError(self.name, f"throttling simulato su {key}")
+        return entry['payload']
+
+    def get_expirations(self, ticker):
+        return list(self._next(('get_expirations', ticker)))
+
+    def get_option_chain(self, ticker, expiration):
+        calls, puts = self._next(('get_option_chain', ticker, expiration))
+        return _frame_from_json(calls), _frame_from_json(puts)
+
+    def get_history(self, symbol, period="5d"):
+        return _frame_from_json(self._next(('get_history', symbol, period)))
+
+
+class ResilientProvider(MarketDataProvider):
+    """
+    Inoltra le chiamate attraverso un SourceGuard condiviso (token bucket,
+    retry con backoff e jitter, circuit breaker per fonte)
+    """
+
+    def __init__(self, inner, guard):
+        self.inner = inner
+        self.guard = guard
+        self.name = inner.name
+
+    def get_expirations(self, ticker):
+        return self.guard.call(self.inner.get_expirations, ticker)
+
+    def get_option_chain(self, ticker, expiration):
+        return self.guard.call(self.inner.get_option_chain, ticker, expiration)
+
+    def get_history(self, symbol, period="5d"):
+        return self.guard.call(self.inner.get_history, symbol, period)
+
+
+_yfinance_provider = YFinanceProvider()
+_default_provider = None
+_default_lock = threading.Lock()
+
+
+def get_default_provider():
+    """Provider yfinance condiviso dal processo, protetto dal SourceGuard 'yfinance' corrente"""
+    global _default_provider
+    guard = get_source_guard("yfinance")
+    with _default_lock:
+        # Il guard viene ricostruito quando cambia la configurazione
+        if _default_provider is None or _default_provider.guard is not guard:
+            _default_provider = ResilientProvider(_yfinance_provider, guard)
+        return _default_provider
+
+
+def create_provider(config=None):
+    """
+    Provider secondo data_sources.options di config.yaml:
+    primary 'yfinance' o 'replay', con record: true per registrare
+    """
+    options_config = (config or {}).get('data_sources', {}).get('options', {})
+    source = options_config.get('primary', 'yfinance')
+    record_dir = options_config.get('record_dir', DEFAULT_RECORD_DIR)
+
+    if source == 'replay':
+        return ReplayProvider(record_dir, speed=options_config.get('replay_speed'))
+
+    if source != 'yfinance':
+        logger.warning(f"⚠️ Provider {source} non supportato, uso yfinance")
+
+    # Limiter/breaker condivisi da tutti i fetcher della fonte
+    guard = get_source_guard("yfinance", **guard_settings_from_config(options_config))
+    if options_config.get('record', False):
+        return ResilientProvider(RecordingProvider(_yfinance_provider, record_dir), guard)
+    return get_default_provider()
+
+
+if __name__ == "__main__":
+    import sys
+    from data.batch_fetcher import BatchOptionsFetcher
+    from utils.helpers import load_config
+
+    # Load test offline: python -m data.providers <record_dir> [speed] [throttle_rate]
+    record_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RECORD_DIR
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    throttle_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+
+    config = load_config()
+    options_config = config.get('data_sources', {}).get('options', {})
+    guard = get_source_guard("replay", **guard_settings_from_config(options_config))
+    provider = ResilientProvider(ReplayProvider(record_dir, speed, throttle_rate), guard)
+
+    batch = BatchOptionsFetcher(config, provider=provider)
+    frame = batch.fetch_universe()
+    report = frame.get_timing_report()
+    stats = guard.get_stats()
+    print(report)
+    print(stats)
+    print(f"Throughput: {stats['calls'] / report['cycle_time']:.1f} chiamate/s "
+          f"({stats['retries']} retry, {len(report['errors'])} ticker falliti)")
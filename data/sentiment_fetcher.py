@@ -2,40 +2,95 @@
 Modulo per fetching sentiment da siti web e Telegram
 """
 
+import asyncio
+import aiohttp
 import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from datetime import datetime
 import re
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import json
 import feedparser
 from urllib.parse import urljoin, urlparse
 import logging
+from data.dedup import ArticleDeduplicator, item_key
+from data.http_cache import HTTPCacheStore, DEFAULT_HTTP_CACHE_PATH
+from data.html_extract import (
+    DEFAULT_MAX_BYTES, charset_from_content_type, extract_text, find_article_elements, read_capped
+)
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Parametri di default del fetch concorrente (sovrascrivibili da sentiment_sources.fetch)
+DEFAULT_REQUEST_TIMEOUT = 10
+DEFAULT_CYCLE_DEADLINE = 30
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_FULLTEXT_WORKERS = 4
+DEFAULT_ARTICLE_TIMEOUT = 5
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Limiti della cache risultati per fonte (sovrascrivibili da sentiment_sources.fetch.cache)
+DEFAULT_CACHE_ENTRIES = 200
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_MAX_MB = 32
+
 class SentimentFetcher:
     """Fetcher per dati sentiment da varie fonti"""
     
-    def __init__(self, config: Optional[Dict] = None):
+    def __init__(self, config: Optional[Dict] = None, http_cache: Optional[HTTPCacheStore] = None):
         self.config = config or {}
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
         
-        self.cache = {}
-        self.cache_timeout = 300
+        fetch_config = self.config.get('sentiment_sources', {}).get('fetch', {}) or {}
+        
+        # Timeout per richiesta di feed e pagine, uguale per il percorso sincrono e asincrono
+        self.request_timeout = fetch_config.get('timeout', DEFAULT_REQUEST_TIMEOUT)
+        
+        # Testo completo degli articoli RSS: pool limitato che riusa le connessioni keep-alive
+        self.fulltext_workers = fetch_config.get('fulltext_workers', DEFAULT_FULLTEXT_WORKERS)
+        self.article_timeout = fetch_config.get('article_timeout', DEFAULT_ARTICLE_TIMEOUT)
+        adapter = HTTPAdapter(pool_connections=DEFAULT_MAX_CONNECTIONS, pool_maxsize=self.fulltext_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._fulltext_pool = ThreadPoolExecutor(max_workers=self.fulltext_workers, thread_name_prefix='fulltext')
+        
+        # Le pagine HTML vengono lette in streaming solo fino a max_page_bytes
+        self.max_page_bytes = fetch_config.get('max_page_bytes', DEFAULT_MAX_BYTES)
+        
+        # Risultati per fonte (website_/rss_/telegram_), limitati per numero, età e memoria
+        cache_config = fetch_config.get('cache', {}) or {}
+        self.cache = TTLCache(
+            max_size=cache_config.get('max_entries', DEFAULT_CACHE_ENTRIES),
+            ttl=cache_config.get('ttl', DEFAULT_CACHE_TTL),
+            max_bytes=int(cache_config.get('max_mb', DEFAULT_CACHE_MAX_MB) * 1024 * 1024)
+        )
+        self.last_cycle_stats = {}
+        
+        # Validatori ETag/Last-Modified persistenti: su 304 si riusa il risultato parsato
+        self.http_cache = http_cache or HTTPCacheStore(fetch_config.get('http_cache_path', DEFAULT_HTTP_CACHE_PATH))
+        
+        # Stessa notizia da più fonti -> un solo elemento con tutte le provenienze
+        self.deduplicator = ArticleDeduplicator.from_config(self.config)
+        
+        # Ingestione incrementale: callable(chiavi) -> chiavi già ingerite (es. OptionsDatabase.filter_seen)
+        self.seen_filter: Optional[Callable[[List[str]], Set[str]]] = None
         
     def fetch_website_articles(self, url: str, max_articles: int = 10) -> List[Dict]:
         cache_key = f"website_{url}"
-        if self._is_cached(cache_key):
-            return self.cache[cache_key]
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            if url.endswith('.xml') or 'rss' in url.lower() or 'feed' in url.lower():
+            if self._is_feed_url(url):
                 articles = self._parse_rss_feed(url, max_articles)
             else:
                 articles = self._scrape_website(url, max_articles)
@@ -45,8 +100,7 @@ class SentimentFetcher:
                 article['source_url'] = url
                 article['source_type'] = 'website'
             
-            self.cache[cache_key] = articles
-            self._update_cache_timestamp(cache_key)
+            self.cache.set(cache_key, articles)
             
             logger.info(f"✅ Scaricati {len(articles)} articoli da {url}")
             return articles
@@ -55,10 +109,78 @@ class SentimentFetcher:
             logger.error(f"❌ Errore fetching da {url}: {e}")
             return []
     
+    @staticmethod
+    def _is_feed_url(url: str) -> bool:
+        return url.endswith('.xml') or 'rss' in url.lower() or 'feed' in url.lower()
+    
+    def _fetch_with_validators(self, url: str, parse, max_bytes: Optional[int] = None,
+                               enrich: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+        """
+        GET condizionale: su 304 restituisce il risultato parsato in cache.
+        parse riceve i byte e il charset dichiarato dalla risposta (o None).
+        parse_seconds misura solo parse; enrich (es. download del testo
+        completo) completa il risultato prima del salvataggio ma non è cronometrato
+        """
+        cached = self.http_cache.get(url)
+        with self.session.get(url, headers=self.http_cache.conditional_headers(cached),
+                              timeout=self.request_timeout, stream=True) as response:
+            if response.status_code == 304 and cached:
+                self.http_cache.record_not_modified(cached)
+                return cached['payload']
+            response.raise_for_status()
+            content = read_capped(response.iter_content(STREAM_CHUNK_SIZE), max_bytes)
+            encoding = charset_from_content_type(response.headers.get('Content-Type'))
+        
+        start = time.perf_counter()
+        payload = parse(content, encoding)
+        parse_seconds = time.perf_counter() - start
+        if enrich is not None:
+            enrich(payload)
+        self.http_cache.store(url, response.headers, payload, len(content), parse_seconds)
+        return payload
+    
     def _parse_rss_feed(self, feed_url: str, max_articles: int) -> List[Dict]:
-        articles = []
-        feed = feedparser.parse(feed_url)
+        return self._fetch_with_validators(
+            feed_url, lambda content, encoding: self._rss_articles(content, max_articles), enrich=self._fill_full_text
+        )
+    
+    def _rss_articles(self, content: bytes, max_articles: int) -> List[Dict]:
+        feed = feedparser.parse(content)
+        return self._drop_seen(self._feed_to_articles(feed, max_articles))
+    
+    def _drop_seen(self, items: List[Dict]) -> List[Dict]:
+        """Scarta gli elementi già ingeriti (nessun download del testo completo)"""
+        if self.seen_filter is None or not items:
+            return items
+        seen = self.seen_filter([item_key(item) for item in items])
+        return [item for item in items if item_key(item) not in seen]
+    
+    def _fill_full_text(self, articles: List[Dict]):
+        """
+        Testo completo degli articoli senza content, estratto in parallelo.
+        Ogni download ha un budget di article_timeout secondi; allo scadere
+        resta il summary. Gli articoli mantengono l'ordine del feed.
+        """
+        pending = [article for article in articles if not article['content'] and article['link']]
+        futures = [
+            self._fulltext_pool.submit(self._extract_article_text, article['link'], self.article_timeout)
+            for article in pending
+        ]
+        
+        # Attesa complessiva: un budget per ogni "giro" di worker del pool
+        rounds = -(-len(pending) // self.fulltext_workers)
+        deadline = time.monotonic() + rounds * self.article_timeout + 1
         
+        for article, future in zip(pending, futures):
+            try:
+                full_text = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                future.cancel()
+                full_text = ''
+            article['full_text'] = full_text[:5000] or article['summary']
+    
+    def _feed_to_articles(self, feed, max_articles: int) -> List[Dict]:
+        articles = []
         for entry in feed.entries[:max_articles]:
             article = {
                 'title': entry.get('title', ''),
@@ -66,17 +188,10 @@ class SentimentFetcher:
                 'content': entry.get('content', [{}])[0].get('value', '') if entry.get('content') else '',
                 'published': entry.get('published', ''),
                 'link': entry.get('link', ''),
+                'guid': entry.get('id', ''),
                 'author': entry.get('author', ''),
                 'categories': entry.get('tags', [])
             }
-            
-            if not article['content'] and article['link']:
-                try:
-                    full_text = self._extract_article_text(article['link'])
-                    article['full_text'] = full_text[:5000]
-                except:
-                    article['full_text'] = article['summary']
-            
             articles.append(article)
         
         return articles
@@ -85,25 +200,26 @@ class SentimentFetcher:
         articles = []
         
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            article_elements = soup.find_all(['article', 'div'], class_=re.compile(r'(article|post|news|story)', re.I))
-            
-            if not article_elements:
-                article_elements = soup.find_all(['h1', 'h2', 'h3'])
-            
-            for element in article_elements[:max_articles]:
-                article = self._extract_article_from_element(element, url)
-                if article and article.get('title'):
-                    articles.append(article)
+            articles = self._fetch_with_validators(
+                url, lambda content, encoding: self._parse_website_html(content, url, max_articles, encoding),
+                self.max_page_bytes
+            )
             
         except Exception as e:
             logger.error(f"Errore scraping {url}: {e}")
         
         return articles
     
+    def _parse_website_html(self, content: bytes, url: str, max_articles: int,
+                            encoding: Optional[str] = None) -> List[Dict]:
+        articles = []
+        for element in find_article_elements(content, max_articles, encoding):
+            article = self._extract_article_from_element(element, url)
+            if article and article.get('title'):
+                articles.append(article)
+        
+        return articles
+    
     def _extract_article_from_element(self, element, base_url: str) -> Optional[Dict]:
         try:
             title = ''
@@ -144,36 +260,24 @@ class SentimentFetcher:
             logger.error(f"Errore estrazione articolo: {e}")
             return None
     
-    def _extract_article_text(self, url: str) -> str:
+    def _extract_article_text(self, url: str, timeout: float = 10) -> str:
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-            
-            content_selectors = ['article', 'main', '.content', '.post-content', '.article-content', '[role="main"]']
-            
-            content = None
-            for selector in content_selectors:
-                content = soup.select_one(selector)
-                if content:
-                    break
-            
-            if not content:
-                content = soup
-            
-            text = content.get_text(separator=' ', strip=True)
-            text = ' '.join(text.split())
-            
-            return text[:10000]
+            with self.session.get(url, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                content = read_capped(response.iter_content(STREAM_CHUNK_SIZE), self.max_page_bytes)
+                encoding = charset_from_content_type(response.headers.get('Content-Type'))
+            return self._html_to_text(content, encoding)
             
         except Exception as e:
             logger.error(f"Errore estrazione testo da {url}: {e}")
             return ""
     
+    def _html_to_text(self, content: bytes, encoding: Optional[str] = None) -> str:
+        return extract_text(content, encoding=encoding)
+    
     def fetch_all_sources(self, sources_config: Dict) -> Dict[str, List[Dict]]:
+        self.cache.purge_expired()
+        self.http_cache.start_cycle()
         all_data = {
             'websites': [],
             'telegram': [],
@@ -194,7 +298,10 @@ class SentimentFetcher:
         telegram_channels = sources_config.get('telegram_channels', [])
         for channel in telegram_channels:
             try:
-                messages = self._fetch_telegram_public(channel['username'])
+                messages = self.cache.get_or_load(
+                    f"telegram_{channel['username']}",
+                    lambda: self._fetch_telegram_public(channel['username'])
+                )
                 for msg in messages:
                     msg['source_name'] = channel['name']
                     msg['priority'] = channel.get('priority', 1)
@@ -205,7 +312,10 @@ class SentimentFetcher:
         rss_feeds = sources_config.get('rss_feeds', [])
         for feed in rss_feeds:
             try:
-                articles = self._parse_rss_feed(feed['url'], max_articles=10)
+                articles = self.cache.get_or_load(
+                    f"rss_{feed['url']}",
+                    lambda: self._parse_rss_feed(feed['url'], max_articles=10)
+                )
                 for article in articles:
                     article['source_name'] = feed['name']
                     article['priority'] = 2
@@ -213,8 +323,217 @@ class SentimentFetcher:
             except Exception as e:
                 logger.error(f"Errore RSS {feed['name']}: {e}")
         
+        self.last_cycle_stats = {
+            'http_cache': self.http_cache.get_cycle_stats(),
+            'cache': self.cache.get_stats()
+        }
+        return all_data
+    
+    def fetch_unique_items(self, sources_config: Dict, concurrent: bool = True) -> List[Dict]:
+        """
+        Tutte le fonti in un'unica lista deduplicata, pronta per SentimentAnalyzer.
+        Ogni elemento riporta in 'sources' le fonti che hanno pubblicato la notizia.
+        """
+        if concurrent:
+            all_data = self.fetch_all_sources_concurrent(sources_config)
+        else:
+            all_data = self.fetch_all_sources(sources_config)
+        
+        items = []
+        for kind, source_type in (('websites', 'website'), ('telegram', 'telegram'), ('rss', 'rss')):
+            for item in all_data[kind]:
+                item.setdefault('source_type', source_type)
+                items.append(item)
+        
+        fetched = len(items)
+        items = self._drop_seen(items)
+        self.last_cycle_stats['already_ingested'] = fetched - len(items)
+        
+        unique = self.deduplicator.deduplicate(items)
+        self.last_cycle_stats['dedup'] = self.deduplicator.last_stats
+        return unique
+    
+    def fetch_all_sources_concurrent(self, sources_config: Dict, **kwargs) -> Dict[str, List[Dict]]:
+        """Versione sincrona di fetch_all_sources_async (per scheduler e Streamlit)"""
+        return asyncio.run(self.fetch_all_sources_async(sources_config, **kwargs))
+    
+    async def fetch_all_sources_async(self, sources_config: Dict, deadline: Optional[float] = None,
+                                      per_host_limit: Optional[int] = None,
+                                      session: Optional["aiohttp.ClientSession"] = None) -> Dict[str, List[Dict]]:
+        """
+        Fetch concorrente di siti, canali Telegram e feed RSS.
+        Le fonti non completate entro deadline secondi vengono cancellate e il
+        risultato contiene solo quelle concluse (dettagli in last_cycle_stats).
+        """
+        fetch_config = sources_config.get('fetch', {}) or {}
+        deadline = deadline or fetch_config.get('cycle_deadline', DEFAULT_CYCLE_DEADLINE)
+        per_host_limit = per_host_limit or fetch_config.get('per_host_limit', DEFAULT_PER_HOST_LIMIT)
+        timeout = fetch_config.get('timeout', self.request_timeout)
+        
+        sources = (
+            [('websites', site) for site in sources_config.get('websites', [])] +
+            [('telegram', channel) for channel in sources_config.get('telegram_channels', [])] +
+            [('rss', feed) for feed in sources_config.get('rss_feeds', [])]
+        )
+        
+        all_data = {
+            'websites': [],
+            'telegram': [],
+            'rss': []
+        }
+        start = time.monotonic()
+        self.cache.purge_expired()
+        self.http_cache.start_cycle()
+        
+        owns_session = session is None
+        if owns_session:
+            connector = aiohttp.TCPConnector(
+                limit=fetch_config.get('max_connections', DEFAULT_MAX_CONNECTIONS),
+                limit_per_host=per_host_limit
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers=dict(self.session.headers),
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            )
+        
+        try:
+            tasks = {
+                asyncio.create_task(self._fetch_source_async(session, kind, source)): (kind, source)
+                for kind, source in sources
+            }
+            done, pending = await asyncio.wait(tasks, timeout=deadline) if tasks else (set(), set())
+            
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            
+            failed = []
+            for task in done:
+                kind, source = tasks[task]
+                if task.exception() is not None:
+                    logger.error(f"Errore {kind} {source['name']}: {task.exception()}")
+                    failed.append(source['name'])
+                    continue
+                all_data[kind].extend(task.result())
+        finally:
+            if owns_session:
+                await session.close()
+        
+        timed_out = [tasks[task][1]['name'] for task in pending]
+        if timed_out:
+            logger.warning(f"⚠️ Fonti oltre la deadline di {deadline}s: {', '.join(timed_out)}")
+        
+        self.last_cycle_stats = {
+            'sources': len(sources),
+            'completed': len(done) - len(failed),
+            'failed': failed,
+            'timed_out': timed_out,
+            'elapsed': round(time.monotonic() - start, 3),
+            'http_cache': self.http_cache.get_cycle_stats(),
+            'cache': self.cache.get_stats()
+        }
         return all_data
     
+    async def _fetch_source_async(self, session: "aiohttp.ClientSession", kind: str, source: Dict) -> List[Dict]:
+        if kind == 'telegram':
+            # Fetch sincrono: in un thread, per non fermare le altre fonti né la deadline
+            items = await asyncio.to_thread(
+                self.cache.get_or_load,
+                f"telegram_{source['username']}",
+                lambda: self._fetch_telegram_public(source['username'])
+            )
+            for msg in items:
+                msg['source_name'] = source['name']
+                msg['priority'] = source.get('priority', 1)
+            return items
+        
+        url = source['url']
+        cache_key = f"{'website' if kind == 'websites' else 'rss'}_{url}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        async def parse_feed(content, encoding):
+            return await asyncio.to_thread(self._rss_articles, content, 10)
+        
+        async def fill_feed(articles):
+            await self._fill_full_text_async(session, articles)
+        
+        async def parse_website(content, encoding):
+            return await asyncio.to_thread(self._parse_website_html, content, url, 10, encoding)
+        
+        if kind == 'rss' or self._is_feed_url(url):
+            items = await self._async_fetch_with_validators(session, url, parse_feed, enrich=fill_feed)
+        else:
+            items = await self._async_fetch_with_validators(session, url, parse_website, self.max_page_bytes)
+        
+        for item in items:
+            if kind == 'websites':
+                item['fetch_timestamp'] = datetime.now().isoformat()
+                item['source_url'] = url
+                item['source_type'] = 'website'
+            item['source_name'] = source['name']
+            item['priority'] = source.get('priority', 1) if kind == 'websites' else 2
+        self.cache.set(cache_key, items)
+        return items
+    
+    async def _fill_full_text_async(self, session: "aiohttp.ClientSession", articles: List[Dict]):
+        """Testo completo degli articoli RSS senza content, scaricato in parallelo"""
+        async def fill(article):
+            try:
+                content, encoding = await asyncio.wait_for(
+                    self._async_get(session, article['link'], self.max_page_bytes), self.article_timeout
+                )
+                full_text = await asyncio.to_thread(self._html_to_text, content, encoding)
+                article['full_text'] = full_text[:5000]
+            except Exception as e:
+                logger.debug(f"Testo completo non disponibile per {article['link']}: {e}")
+                article['full_text'] = article['summary']
+        
+        await asyncio.gather(*(fill(a) for a in articles if not a['content'] and a['link']))
+    
+    async def _async_fetch_with_validators(self, session: "aiohttp.ClientSession", url: str, parse,
+                                           max_bytes: Optional[int] = None, enrich=None) -> List[Dict]:
+        """
+        Versione asincrona di _fetch_with_validators (parse ed enrich sono
+        coroutine); letture e scritture SQLite della cache girano in un thread
+        """
+        cached = await asyncio.to_thread(self.http_cache.get, url)
+        async with session.get(url, headers=self.http_cache.conditional_headers(cached)) as response:
+            if response.status == 304 and cached:
+                await asyncio.to_thread(self.http_cache.record_not_modified, cached)
+                return cached['payload']
+            response.raise_for_status()
+            content = await self._read_capped_async(response, max_bytes)
+            headers = response.headers
+            encoding = response.charset
+        
+        start = time.perf_counter()
+        payload = await parse(content, encoding)
+        parse_seconds = time.perf_counter() - start
+        if enrich is not None:
+            await enrich(payload)
+        await asyncio.to_thread(self.http_cache.store, url, headers, payload, len(content), parse_seconds)
+        return payload
+    
+    async def _async_get(self, session: "aiohttp.ClientSession", url: str,
+                         max_bytes: Optional[int] = None) -> Tuple[bytes, Optional[str]]:
+        """Corpo (limitato a max_bytes) e charset dichiarato della risposta"""
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await self._read_capped_async(response, max_bytes), response.charset
+    
+    @staticmethod
+    async def _read_capped_async(response: "aiohttp.ClientResponse", max_bytes: Optional[int]) -> bytes:
+        buffer = bytearray()
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            buffer.extend(chunk)
+            if max_bytes and len(buffer) >= max_bytes:
+                break
+        return bytes(buffer[:max_bytes] if max_bytes else buffer)
+    
     def _fetch_telegram_public(self, channel_username: str) -> List[Dict]:
         """Fetch base per canali Telegram pubblici - da implementare"""
         logger.warning(f"⚠️ Fetch Telegram per {channel_username} - implementazione base")
@@ -225,19 +544,6 @@ class SentimentFetcher:
                 'source': channel_username
             }
         ]
-    
-    def _is_cached(self, cache_key: str) -> bool:
-        if cache_key not in self.cache:
-            return False
-        if cache_key not in self._cache_timestamps:
-            return False
-        elapsed = (datetime.now() - self._cache_timestamps[cache_key]).total_seconds()
-        return elapsed < self.cache_timeout
-    
-    def _update_cache_timestamp(self, cache_key: str):
-        if not hasattr(self, '_cache_timestamps'):
-            self._cache_timestamps = {}
-        self._cache_timestamps[cache_key] = datetime.now()
 
 if __name__ == "__main__":
     config = {
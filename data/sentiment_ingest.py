@@ -0,0 +1,95 @@
+"""
+sentiment_ingest.py - Ingestione incrementale del sentiment (solo elementi nuovi)
+"""
+import time
+from typing import Dict, Optional
+from analysis.sentiment_analyzer import SentimentAnalyzer
+from analysis.sentiment_index import SentimentIndex
+from data.database import OptionsDatabase
+from data.dedup import item_text
+from data.sentiment_fetcher import SentimentFetcher
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_HISTORY_DAYS = 7
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class SentimentIngestor:
+    """
+    Un ciclo scarica le fonti, scarta gli elementi già ingeriti (indice
+    seen_items nel database, per link/GUID/message-id), deduplica, analizza
+    e salva in sentiment_data solo il contenuto nuovo. A regime il costo del
+    ciclo dipende dalle notizie nuove, non dalla dimensione dei feed.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, db: Optional[OptionsDatabase] = None,
+                 fetcher: Optional[SentimentFetcher] = None, analyzer: Optional[SentimentAnalyzer] = None):
+        self.config = config or {}
+        self.db = db or OptionsDatabase.from_config(self.config)
+        self.fetcher = fetcher or SentimentFetcher(self.config)
+        self.analyzer = analyzer or SentimentAnalyzer(self.config)
+        self.fetcher.seen_filter = self.db.filter_seen
+        self.index = SentimentIndex.from_config(self.config)
+
+        sentiment_config = self.config.get('analysis', {}).get('sentiment', {})
+        self.history_days = sentiment_config.get('history_days', DEFAULT_HISTORY_DAYS)
+        self._last_purge = 0.0
+        self.last_cycle_stats = {}
+
+    def run_cycle(self, concurrent: bool = True) -> Dict:
+        """Esegue un ciclo di ingestione e restituisce le statistiche"""
+        start = time.monotonic()
+        if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+            purged = self.db.purge_seen_items(self.history_days)
+            self._last_purge = time.monotonic()
+            if purged:
+                logger.info(f"🧹 Indice seen_items: rimosse {purged} chiavi più vecchie di {self.history_days} giorni")
+
+        sources_config = self.config.get('sentiment_sources', {})
+        items = self.fetcher.fetch_unique_items(sources_config, concurrent=concurrent)
+        fetch_time = time.monotonic() - start
+
+        scoring_start = time.monotonic()
+        texts = [item_text(item) for item in items]
+        scores = self.analyzer.analyze_batch(texts)
+        for item, text, sentiment in zip(items, texts, scores.to_dict('records')):
+            item['text'] = text
+            item['sentiment'] = sentiment
+        self.index.update_many(items)
+        scoring_time = time.monotonic() - scoring_start
+
+        saved = self.db.save_sentiment_items(items)
+        # Duplicati di notizie già salvate: solo le chiavi, per non riscaricarli
+        suppressed = self.db.mark_seen(self.fetcher.deduplicator.last_suppressed)
+
+        fetcher_stats = self.fetcher.last_cycle_stats
+        self.last_cycle_stats = {
+            'new_items': len(items),
+            'saved': len(saved),
+            'already_ingested': fetcher_stats.get('already_ingested', 0),
+            'duplicates': fetcher_stats.get('dedup', {}).get('collapsed', 0),
+            'suppressed_marked_seen': suppressed,
+            'fetch_time': round(fetch_time, 3),
+            'scoring_time': round(scoring_time, 3),
+            'memo_hit_ratio': round(self.analyzer.get_memo_stats().get('hit_ratio', 0.0), 3),
+            'cycle_time': round(time.monotonic() - start, 3)
+        }
+        logger.info(f"📰 Sentiment: {len(saved)} nuovi elementi salvati "
+                    f"({self.last_cycle_stats['already_ingested']} già ingeriti) "
+                    f"in {self.last_cycle_stats['cycle_time']:.2f}s")
+        return self.last_cycle_stats
+    
+    def get_sentiment_data(self, ticker: str) -> Dict:
+        """Indice sentiment corrente del ticker, nel formato atteso da SignalGenerator"""
+        return self.index.get(ticker)
+
+
+if __name__ == "__main__":
+    from utils.helpers import load_config
+
+    ingestor = SentimentIngestor(load_config())
+    print(ingestor.run_cycle())
+    print(ingestor.run_cycle())
+    print(ingestor.index.snapshot())
@@ -0,0 +1,243 @@
+"""
+write_behind.py - Scrittura differita degli snapshot opzioni su OptionsDatabase
+"""
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+from data.database import OptionsDatabase
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0   # secondi massimi prima di scrivere un lotto parziale
+DEFAULT_PUT_TIMEOUT = 2.0      # secondi di attesa del produttore con coda piena
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    Coda limitata svuotata da un thread in background che scrive a lotti
+    con OptionsDatabase.save_many: il ciclo di fetch accoda e prosegue, la
+    latenza del disco resta fuori dal percorso critico.
+
+    Con la coda piena submit() attende fino a put_timeout (backpressure),
+    poi scarta lo snapshot; attese e scarti finiscono in get_stats().
+    Contatori in snapshot (submitted, written, failed, dropped), tranne
+    expirations_written (righe options_data, una per scadenza).
+    close() (registrato anche con atexit) scrive tutto ciò che è in coda.
+    """
+
+    def __init__(self, db: OptionsDatabase, max_queue: int = DEFAULT_MAX_QUEUE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 put_timeout: float = DEFAULT_PUT_TIMEOUT):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'written': 0,
+            'failed': 0,
+            'expirations_written': 0,
+            'batches': 0,
+            'dropped': 0,
+            'blocked_puts': 0,
+            'blocked_seconds': 0.0,
+            'max_depth': 0,
+            'last_batch_size': 0,
+            'last_write_seconds': 0.0,
+            'write_seconds': 0.0
+        }
+        self._closed = False
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, db: OptionsDatabase, config: Optional[Dict] = None):
+        writer_config = (config or {}).get('data_sources', {}).get('database', {}).get('write_behind', {}) or {}
+        return cls(
+            db,
+            max_queue=writer_config.get('max_queue', DEFAULT_MAX_QUEUE),
+            batch_size=writer_config.get('batch_size', DEFAULT_BATCH_SIZE),
+            flush_interval=writer_config.get('flush_interval', DEFAULT_FLUSH_INTERVAL),
+            put_timeout=writer_config.get('put_timeout', DEFAULT_PUT_TIMEOUT)
+        )
+
+    def submit(self, ticker: str, options_data: Any) -> bool:
+        """Accoda uno snapshot (OptionChain, OptionSurface o dict); False se scartato"""
+        if self._closed:
+            logger.warning(f"⚠️ Writer chiuso: snapshot {ticker} non accodato")
+            return False
+
+        item = (ticker, options_data)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            start = time.monotonic()
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+                accepted = True
+            except queue.Full:
+                accepted = False
+            with self._stats_lock:
+                self._stats['blocked_puts'] += 1
+                self._stats['blocked_seconds'] += time.monotonic() - start
+                if not accepted:
+                    self._stats['dropped'] += 1
+            if not accepted:
+                logger.warning(f"⚠️ Coda scritture piena: snapshot {ticker} scartato")
+                return False
+
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=0.05 if self._stopping.is_set() else self.flush_interval)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return  # close() senza sentinella (coda piena): coda svuotata
+                continue
+
+            batch = []
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+            while len(batch) < self.batch_size and not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        start = time.monotonic()
+        failed = False
+        try:
+            expirations = self.db.save_many(batch)
+        except Exception as e:
+            logger.error(f"❌ Errore scrittura differita ({len(batch)} snapshot): {e}")
+            expirations = 0
+            failed = True
+        elapsed = time.monotonic() - start
+
+        with self._stats_lock:
+            self._stats['failed' if failed else 'written'] += len(batch)
+            self._stats['expirations_written'] += expirations
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_write_seconds'] = elapsed
+            self._stats['write_seconds'] += elapsed
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Attende che la coda sia scritta; False se scade il timeout"""
+        if timeout is None:
+            self._queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Scrive ciò che resta in coda e ferma il thread (attesa massima timeout).
+        Non si blocca con la coda piena: il thread si ferma quando la trova vuota
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+        stats = self.get_stats()
+        if self._thread.is_alive():
+            logger.warning(f"⚠️ Writer chiuso con {stats['queue_depth']} snapshot ancora in coda")
+        logger.info(f"✅ Writer chiuso: {stats['written']} snapshot ({stats['expirations_written']} scadenze) "
+                    f"in {stats['batches']} lotti, {stats['failed']} falliti, {stats['dropped']} scartati")
+
+    def get_stats(self) -> Dict:
+        """Profondità della coda, throughput e metriche di backpressure"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_queue'] = self._queue.maxsize
+        processed = stats['written'] + stats['failed']
+        stats['avg_batch_size'] = processed / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    import pandas as pd
+    from data.option_chain import OptionChain
+
+    strikes = [400 + i for i in range(100)]
+    side = pd.DataFrame({'strike': strikes, 'volume': 10, 'openInterest': 100, 'impliedVolatility': 0.2})
+    snapshots = [
+        (ticker, OptionChain(calls=side, puts=side, spot_price=450, expiration=f"2026-12-{day:02d}",
+                             ticker=ticker, timestamp=f"2026-10-17T10:{day:02d}:00"))
+        for ticker in ('SPY', 'QQQ', 'IWM') for day in range(1, 29)
+    ]
+    for _, chain in snapshots:
+        chain.calls = chain.calls.assign(delta=0.3)
+        chain.puts = chain.puts.assign(delta=-0.3)
+
+    # Un database nuovo per modalità: ognuna scrive le stesse righe da zero.
+    # Gran parte del tempo è il calcolo delle metriche per catena; il guadagno
+    # di save_many (un fsync per lotto) cresce con la latenza del disco
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = [OptionsDatabase(str(Path(tmp) / f"bench_{i}.db"), synchronous="FULL") for i in range(3)]
+
+        start = time.perf_counter()
+        for ticker, chain in snapshots:
+            databases[0].save_options_data(ticker, chain)
+        inline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        databases[1].save_many(snapshots)
+        bulk = time.perf_counter() - start
+
+        writer = WriteBehindWriter(databases[2])
+        start = time.perf_counter()
+        for ticker, chain in snapshots:
+            writer.submit(ticker, chain)
+        enqueue = time.perf_counter() - start
+        writer.close()
+
+        print(f"{len(snapshots)} snapshot")
+        print(f"save_options_data (commit per snapshot): {inline * 1000:8.1f} ms")
+        print(f"save_many (un commit):                   {bulk * 1000:8.1f} ms")
+        print(f"write-behind (tempo nel ciclo di fetch): {enqueue * 1000:8.1f} ms")
+        print(writer.get_stats())
+        for db in databases:
+            db.close()
@@ -19,10 +19,16 @@ from utils.logger import setup_logger
 from utils.scheduler import TaskScheduler
 from utils.helpers import load_config
 from data.database import OptionsDatabase
+from data.chain_store import ChainDiskCache
+from data.batch_fetcher import BatchOptionsFetcher
+from data.write_behind import WriteBehindWriter
 
 # Configura logger
 logger = setup_logger("main")
 
+# Pulizia dello storico opzioni oltre history_days: una volta al giorno
+RETENTION_INTERVAL = 24 * 3600
+
 class OptionsSentimentApp:
     """Applicazione principale"""
     
@@ -33,9 +39,13 @@ class OptionsSentimentApp:
         self.config = load_config()
         
         # Inizializza componenti
-        self.db = OptionsDatabase()
+        self.db = OptionsDatabase.from_config(self.config)
         self.scheduler = TaskScheduler()
         
+        # Ciclo di ingestione: le catene vengono accodate e scritte a lotti in background
+        self.writer = WriteBehindWriter.from_config(self.db, self.config)
+        self.batch_fetcher = BatchOptionsFetcher(self.config, writer=self.writer)
+        
         # Stato
         self.is_running = False
     
@@ -48,9 +58,23 @@ class OptionsSentimentApp:
                 full_path = PROJECT_ROOT / dir_path
                 full_path.mkdir(parents=True, exist_ok=True)
             
+            # Rimuove le catene in cache oltre history_days
+            ChainDiskCache.from_config(self.config).gc()
+            
             # Verifica dipendenze
             self._check_dependencies()
             
+            # Fetch periodico dell'universo asset (salvataggio tramite write-behind)
+            options_config = self.config.get('data_sources', {}).get('options', {})
+            self.scheduler.add_task(
+                "options_ingest",
+                self.batch_fetcher.fetch_universe,
+                options_config.get('update_interval', 300)
+            )
+            
+            # Storico opzioni nel database oltre history_days (primo passaggio all'avvio)
+            self.scheduler.add_task("options_retention", self.purge_options_history, RETENTION_INTERVAL)
+            
             logger.info("✅ Setup completato")
             return True
             
@@ -58,6 +82,11 @@ class OptionsSentimentApp:
             logger.error(f"❌ Errore durante il setup: {e}")
             return False
     
+    def purge_options_history(self):
+        """Retention di options_data e option_quotes (data_sources.market_data.history_days)"""
+        market_config = self.config.get('data_sources', {}).get('market_data', {}) or {}
+        return self.db.purge_options_history(market_config.get('history_days', 30))
+    
     def _check_dependencies(self):
         """Verifica dipendenze base"""
         required = ['pandas', 'numpy', 'yfinance', 'streamlit']
@@ -107,8 +136,14 @@ class OptionsSentimentApp:
             logger.error("Impossibile avviare l'applicazione")
             return
         
-        # Avvia dashboard
-        self.start_dashboard()
+        # Avvia ingestione e dashboard
+        self.scheduler.start()
+        try:
+            self.start_dashboard()
+        finally:
+            self.scheduler.stop()
+            self.writer.close(timeout=10)
+            self.db.close()
 
 def main():
     """Funzione principale"""
@@ -0,0 +1,69 @@
+"""
+Fixture condivise: sito HTTP locale per i test dei fetcher (niente rete esterna)
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class LocalSite:
+    """
+    Server HTTP su 127.0.0.1 con rotte configurabili dal test:
+    path -> dict(body, content_type, delay, headers) oppure callable(request) -> dict.
+    Ogni richiesta viene registrata in requests (path e header)
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site._lock:
+                    site.requests.append({'path': self.path, 'headers': dict(self.headers)})
+                route = site.routes.get(self.path)
+                if callable(route):
+                    route = route(self)
+                if route is None:
+                    self.send_error(404)
+                    return
+                time.sleep(route.get('delay', 0))
+                body = route.get('body', b'')
+                try:
+                    self.send_response(route.get('status', 200))
+                    self.send_header('Content-Type', route.get('content_type', 'text/html; charset=utf-8'))
+                    self.send_header('Content-Length', str(len(body)))
+                    for name, value in route.get('headers', {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client andato via (deadline scaduta)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.block_on_close = False
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def hits(self, path: str) -> list:
+        with self._lock:
+            return [request for request in self.requests if request['path'] == path]
+
+
+@pytest.fixture
+def local_site():
+    site = LocalSite()
+    site.thread.start()
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
@@ -0,0 +1,87 @@
+"""
+Aggregati incrementali dai change set confrontati con il ricalcolo completo su ogni snapshot
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.skew_analyzer import SkewAnalyzer
+from data.chain_diff import ChainDiffer, IncrementalChainAggregates
+from data.option_chain import OptionChain
+
+GRID = np.arange(380.0, 520.0, 5.0)
+
+
+def random_side(rng, strikes):
+    # OI distinti: il muro è unico e il confronto non dipende dal tie-break
+    return pd.DataFrame({
+        'strike': strikes,
+        'openInterest': rng.choice(50000, len(strikes), replace=False),
+        'volume': rng.integers(0, 3000, len(strikes)),
+        'impliedVolatility': rng.uniform(0.1, 0.5, len(strikes)),
+        'bid': rng.uniform(0, 20, len(strikes)),
+        'ask': rng.uniform(20, 40, len(strikes)),
+        'lastPrice': rng.uniform(0, 40, len(strikes))
+    })
+
+
+def random_chain(rng, spot):
+    # Ogni snapshot lista un sottoinsieme diverso di strike: contratti aggiunti e rimossi
+    calls = rng.permutation(rng.choice(GRID, rng.integers(10, len(GRID)), replace=False))
+    puts = rng.permutation(rng.choice(GRID, rng.integers(10, len(GRID)), replace=False))
+    return OptionChain(calls=random_side(rng, calls), puts=random_side(rng, puts),
+                       spot_price=spot, expiration='2026-11-20', ticker='SPY')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_aggregates_match_full_recompute(seed):
+    rng = np.random.default_rng(seed)
+    differ = ChainDiffer()
+    aggregates = IncrementalChainAggregates()
+
+    for step in range(15):
+        spot = 450.0 + rng.normal(0, 5)
+        chain = random_chain(rng, spot)
+        change_set = differ.diff(chain)
+        assert change_set.is_full == (step == 0)
+        incremental = aggregates.apply(change_set, spot)
+
+        calls, puts = chain.side('calls'), chain.side('puts')
+        pcr = incremental.get_pcr()
+        assert pcr['call_oi'] == pytest.approx(calls['open_interest'].sum())
+        assert pcr['put_oi'] == pytest.approx(puts['open_interest'].sum())
+        assert pcr['call_volume'] == pytest.approx(calls['volume'].sum())
+        assert pcr['put_volume'] == pytest.approx(puts['volume'].sum())
+
+        expected = SkewAnalyzer(chain).generate_option_walls(min_oi_threshold=0)
+        walls = incremental.get_walls(min_oi_threshold=0)
+        assert walls['max_pain'] == expected['max_pain']
+        for key in ('calls', 'puts'):
+            assert walls[key][0]['strike'] == expected[key][0]['strike']
+            assert walls[key][0]['open_interest'] == expected[key][0]['open_interest']
+
+
+def test_unchanged_snapshot_is_empty_change_set():
+    rng = np.random.default_rng(1)
+    chain = random_chain(rng, 450.0)
+    differ = ChainDiffer()
+    differ.diff(chain)
+    assert differ.diff(chain).is_empty
+
+
+def test_evict_expired_and_delisted():
+    rng = np.random.default_rng(2)
+    differ = ChainDiffer()
+    aggregates = IncrementalChainAggregates()
+    for expiration in ('2026-10-16', '2026-10-23', '2026-11-20'):
+        chain = random_chain(rng, 450.0)
+        chain.expiration = expiration
+        aggregates.apply(differ.diff(chain))
+
+    stale = differ.evict('SPY', listed=['2026-10-23'], today=date(2026, 10, 17))
+    assert sorted(stale) == [('SPY', '2026-10-16'), ('SPY', '2026-11-20')]
+    assert aggregates.evict('SPY', listed=['2026-10-23'], today=date(2026, 10, 17)) == stale
+    assert aggregates.get('SPY', '2026-10-23') is not None
+    assert aggregates.get('SPY', '2026-11-20') is None
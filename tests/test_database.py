@@ -0,0 +1,57 @@
+"""
+option_quotes: indice per la serie di uno strike e retention per history_days
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.database import OptionsDatabase
+from data.option_chain import OptionChain
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = OptionsDatabase(tmp_path / 'options.db')
+    yield db
+    db.close()
+
+
+def chain(expiration, timestamp):
+    strikes = np.arange(440.0, 461.0, 5.0)
+    side = pd.DataFrame({'strike': strikes, 'openInterest': np.arange(len(strikes)) * 100 + 100,
+                         'impliedVolatility': 0.2})
+    return OptionChain(calls=side, puts=side, spot_price=450.0, expiration=expiration, ticker='SPY',
+                       timestamp=timestamp.isoformat())
+
+
+def test_strike_history_across_expirations_uses_index(db):
+    now = datetime.now().replace(microsecond=0)
+    db.save_many([('SPY', chain(expiration, now - timedelta(minutes=minutes)))
+                  for expiration in ('2026-11-20', '2026-12-18') for minutes in (0, 5)])
+
+    history = db.get_strike_history('SPY', 450.0, option_type='put')
+    assert len(history) == 4
+    assert set(history['expiration']) == {'2026-11-20', '2026-12-18'}
+
+    plan = ' '.join(row[-1] for row in db.conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM option_quotes '
+        'WHERE ticker = ? AND option_type = ? AND strike >= ? AND strike <= ? ORDER BY timestamp',
+        ('SPY', 'put', 450.0, 450.0)))
+    assert 'idx_quotes_strike_timestamp' in plan
+
+
+def test_purge_options_history(db):
+    now = datetime.now().replace(microsecond=0)
+    db.save_many([('SPY', chain('2026-11-20', now - timedelta(days=45))),
+                  ('SPY', chain('2026-11-20', now - timedelta(days=1)))])
+
+    removed = db.purge_options_history(days=30)
+
+    assert removed == 10   # 5 strike x call/put dello snapshot vecchio
+    remaining = db.get_option_quotes('SPY')
+    assert len(remaining) == 10
+    assert remaining['timestamp'].min() > pd.Timestamp(now - timedelta(days=30))
+    assert db.conn.execute('SELECT COUNT(*) FROM options_data').fetchone()[0] == 1
+    assert db.purge_options_history(days=30) == 0
@@ -0,0 +1,37 @@
+"""
+Deduplica tra fonti: l'elemento canonico è quello della fonte più autorevole (priority 1)
+"""
+from data.dedup import ArticleDeduplicator
+
+STORY = ("Federal Reserve officials signaled they are prepared to keep interest rates higher for longer "
+         "as inflation remains sticky, sending Treasury yields up and equities lower on Wednesday")
+
+
+def test_near_duplicates_collapse_into_priority_one():
+    items = [
+        {'title': 'Fed signals higher-for-longer', 'summary': STORY.replace('Wednesday', 'Wed'),
+         'link': 'https://www.marketwatch.com/fed', 'source_name': 'MarketWatch', 'priority': 2},
+        {'title': 'Fed signals higher for longer', 'summary': STORY,
+         'link': 'https://www.reuters.com/fed', 'source_name': 'Reuters', 'priority': 1},
+    ]
+    dedup = ArticleDeduplicator()
+    unique = dedup.deduplicate(items, now=1000.0)
+
+    assert len(unique) == 1
+    assert unique[0]['source_name'] == 'Reuters'
+    assert unique[0]['priority'] == 1
+    assert [s['source_name'] for s in unique[0]['sources']] == ['Reuters', 'MarketWatch']
+    assert unique[0]['duplicate_count'] == 1
+    assert dedup.last_stats['collapsed'] == 1
+
+
+def test_later_low_priority_copy_keeps_priority_one():
+    dedup = ArticleDeduplicator()
+    first = dedup.deduplicate([{'title': 'Fed signals higher for longer', 'summary': STORY,
+                                'source_name': 'Reuters', 'priority': 1}], now=1000.0)
+    again = dedup.deduplicate([{'title': 'Fed signals higher for longer', 'summary': STORY + '.',
+                                'source_name': 'Wall Street Journal', 'priority': 2}], now=1060.0)
+
+    assert again == []
+    assert first[0]['priority'] == 1
+    assert dedup.last_suppressed[0]['source_name'] == 'Wall Street Journal'
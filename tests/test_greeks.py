@@ -0,0 +1,120 @@
+"""
+Greche vettorizzate confrontate con le formule Black-Scholes-Merton chiuse (scipy.stats.norm)
+"""
+import math
+import timeit
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+from analysis.greeks import DAYS_PER_YEAR, black_scholes_greeks, compute_chain_greeks, time_to_expiry
+from data.option_chain import GREEK_COLUMNS, OptionChain, OptionSurface
+
+
+def reference_greeks(spot, strike, t, iv, is_call, rate, dividend_yield):
+    """Un contratto alla volta, con le formule da manuale"""
+    d1 = (math.log(spot / strike) + (rate - dividend_yield + 0.5 * iv ** 2) * t) / (iv * math.sqrt(t))
+    d2 = d1 - iv * math.sqrt(t)
+    q = math.exp(-dividend_yield * t)
+    r = math.exp(-rate * t)
+
+    if is_call:
+        delta = q * norm.cdf(d1)
+        theta = (-spot * q * norm.pdf(d1) * iv / (2 * math.sqrt(t))
+                 - rate * strike * r * norm.cdf(d2) + dividend_yield * spot * q * norm.cdf(d1))
+    else:
+        delta = q * (norm.cdf(d1) - 1)
+        theta = (-spot * q * norm.pdf(d1) * iv / (2 * math.sqrt(t))
+                 + rate * strike * r * norm.cdf(-d2) - dividend_yield * spot * q * norm.cdf(-d1))
+
+    return {
+        'delta': delta,
+        'gamma': q * norm.pdf(d1) / (spot * iv * math.sqrt(t)),
+        'vega': spot * q * norm.pdf(d1) * math.sqrt(t) / 100,
+        'theta': theta / DAYS_PER_YEAR
+    }
+
+
+@pytest.mark.parametrize('rate,dividend_yield', [(0.0, 0.0), (0.045, 0.0), (0.05, 0.013)])
+def test_matches_closed_form(rate, dividend_yield):
+    rng = np.random.default_rng(42)
+    n = 500
+    spot = 450.0
+    strike = rng.uniform(300, 600, n)
+    t = rng.uniform(1 / 365, 2.0, n)
+    iv = rng.uniform(0.05, 1.2, n)
+    is_call = rng.random(n) < 0.5
+
+    greeks = black_scholes_greeks(spot, strike, t, iv, is_call, rate, dividend_yield)
+
+    for i in range(n):
+        expected = reference_greeks(spot, strike[i], t[i], iv[i], is_call[i], rate, dividend_yield)
+        for name, value in expected.items():
+            assert greeks[name][i] == pytest.approx(value, rel=1e-9, abs=1e-12), (name, i)
+
+
+def test_invalid_contracts_get_intrinsic_delta():
+    greeks = black_scholes_greeks(
+        spot=100.0,
+        strike=np.array([90.0, 110.0, 90.0, 110.0]),
+        time_to_expiry=np.array([0.5, 0.5, 0.0, 0.5]),
+        iv=np.array([0.0, np.nan, 0.2, -0.1]),
+        is_call=np.array([True, True, False, False])
+    )
+    np.testing.assert_array_equal(greeks['delta'], [1.0, 0.0, 0.0, -1.0])
+    for name in ('gamma', 'vega', 'theta'):
+        np.testing.assert_array_equal(greeks[name], 0.0)
+
+
+def test_chain_greeks_use_time_to_expiry():
+    now = pd.Timestamp('2026-10-17 14:00', tz='UTC')
+    frame = pd.DataFrame({
+        'strike': [440.0, 460.0],
+        'implied_volatility': [0.18, 0.22],
+        'option_type': ['call', 'put'],
+        'expiration': ['2026-11-20', '2026-12-18']
+    })
+    result = compute_chain_greeks(frame, 450.0, rate=0.045, now=now)
+    t = time_to_expiry(frame['expiration'].to_numpy(), now)
+
+    for i, row in frame.iterrows():
+        expected = reference_greeks(450.0, row['strike'], t[i], row['implied_volatility'],
+                                    row['option_type'] == 'call', 0.045, 0.0)
+        for name, value in expected.items():
+            assert result.loc[i, name] == pytest.approx(value, rel=1e-9)
+
+
+def random_surface(n_expirations=20, n_strikes=250, seed=0):
+    rng = np.random.default_rng(seed)
+    expirations = pd.date_range('2026-10-23', periods=n_expirations, freq='7D').strftime('%Y-%m-%d')
+    strikes = np.linspace(300.0, 550.0, n_strikes)
+
+    def random_side():
+        return pd.DataFrame({'strike': strikes, 'impliedVolatility': rng.uniform(0.1, 0.6, n_strikes)})
+
+    chains = {expiration: OptionChain(calls=random_side(), puts=random_side(), spot_price=450.0,
+                                      expiration=expiration, ticker='SPY') for expiration in expirations}
+    return OptionSurface(chains, ticker='SPY', spot_price=450.0)
+
+
+def test_surface_greeks_match_chain_by_chain():
+    now = pd.Timestamp('2026-10-17 14:00', tz='UTC')
+    surface = random_surface(n_expirations=5, n_strikes=40).apply_greeks(0.045, 0.013, now=now)
+
+    for expiration, chain in random_surface(n_expirations=5, n_strikes=40).items():
+        chain.apply_greeks(0.045, 0.013, now=now)
+        for key in ('calls', 'puts'):
+            pd.testing.assert_frame_equal(surface[expiration].side(key)[GREEK_COLUMNS],
+                                          chain.side(key)[GREEK_COLUMNS])
+
+
+def test_surface_greeks_timing():
+    # Percorso usato da fetch_surface: 10k contratti su 20 scadenze.
+    # Soglia larga per macchine lente/condivise: ~10 ms tipici, il vecchio percorso ~25 ms
+    surface = random_surface()
+    assert surface.contract_count == 10_000
+    surface.apply_greeks(0.045)
+    best = min(timeit.repeat(lambda: surface.apply_greeks(0.045), number=5, repeat=5)) / 5
+    assert best < 0.05, f"OptionSurface.apply_greeks: {best * 1000:.1f} ms"
@@ -0,0 +1,125 @@
+"""
+GET condizionali (ETag / Last-Modified): su 304 si riusa il risultato parsato senza riscaricare
+"""
+import asyncio
+import time
+
+import pytest
+
+from data.http_cache import HTTPCacheStore
+from data.sentiment_fetcher import SentimentFetcher
+
+HOMEPAGE = b'''<html><body>
+<div class="story-card"><h2><a href="/news/1">Markets rally as VIX drops</a></h2></div>
+</body></html>'''
+
+FEED = '''<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>
+<item><title>Fed holds rates</title><link>{link}</link><guid>fed-1</guid>
+<description>Officials kept rates unchanged.</description></item>
+</channel></rss>'''
+
+
+def conditional(body, content_type='text/html; charset=utf-8', etag='"v1"', last_modified=None):
+    """Rotta che risponde 304 quando il client rimanda il validatore corrente"""
+    def route(request):
+        if etag and request.headers.get('If-None-Match') == etag:
+            return {'status': 304}
+        if last_modified and request.headers.get('If-Modified-Since') == last_modified:
+            return {'status': 304}
+        headers = {}
+        if etag:
+            headers['ETag'] = etag
+        if last_modified:
+            headers['Last-Modified'] = last_modified
+        return {'body': body, 'content_type': content_type, 'headers': headers}
+    return route
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = SentimentFetcher({}, http_cache=HTTPCacheStore(tmp_path / 'http_cache.db'))
+    yield fetcher
+    fetcher.http_cache.close()
+
+
+@pytest.mark.parametrize('validators', [{'etag': '"v1"'},
+                                        {'etag': None, 'last_modified': 'Sat, 17 Oct 2026 08:00:00 GMT'}])
+def test_not_modified_reuses_parsed_payload(fetcher, local_site, validators):
+    local_site.routes = {'/news': conditional(HOMEPAGE, **validators)}
+    url = local_site.url('/news')
+
+    fetcher.http_cache.start_cycle()
+    first = fetcher.fetch_website_articles(url)
+    fetcher.cache.clear()
+    second = fetcher.fetch_website_articles(url)
+
+    assert [a['title'] for a in first] == ['Markets rally as VIX drops']
+    assert [a['title'] for a in second] == [a['title'] for a in first]
+    requests = local_site.hits('/news')
+    assert len(requests) == 2
+    assert 'If-None-Match' not in requests[0]['headers']
+    if validators.get('etag'):
+        assert requests[1]['headers']['If-None-Match'] == '"v1"'
+    else:
+        assert requests[1]['headers']['If-Modified-Since'] == validators['last_modified']
+
+    stats = fetcher.http_cache.get_cycle_stats()
+    assert stats['requests'] == 2
+    assert stats['not_modified'] == 1
+    assert stats['bytes_saved'] == len(HOMEPAGE)
+
+
+def test_validators_survive_restart(tmp_path, local_site):
+    local_site.routes = {'/news': conditional(HOMEPAGE)}
+    url = local_site.url('/news')
+
+    first = SentimentFetcher({}, http_cache=HTTPCacheStore(tmp_path / 'http_cache.db'))
+    first.fetch_website_articles(url)
+    first.http_cache.close()
+
+    second = SentimentFetcher({}, http_cache=HTTPCacheStore(tmp_path / 'http_cache.db'))
+    articles = second.fetch_website_articles(url)
+    assert [a['title'] for a in articles] == ['Markets rally as VIX drops']
+    assert second.http_cache.get_cycle_stats()['not_modified'] == 1
+    second.http_cache.close()
+
+
+def test_without_validators_nothing_is_stored(fetcher, local_site):
+    local_site.routes = {'/news': conditional(HOMEPAGE, etag=None)}
+    fetcher.fetch_website_articles(local_site.url('/news'))
+    assert fetcher.http_cache.get(local_site.url('/news')) is None
+
+
+def test_async_not_modified_skips_full_text(fetcher, local_site):
+    pytest.importorskip('aiohttp')
+    feed = FEED.format(link=local_site.url('/fed')).encode()
+    local_site.routes = {
+        '/rss.xml': conditional(feed, content_type='application/rss+xml'),
+        '/fed': {'body': b'<html><body><article><p>Full story</p></article></body></html>', 'delay': 0.3}
+    }
+    config = {'rss_feeds': [{'name': 'Feed', 'url': local_site.url('/rss.xml')}], 'fetch': {'cycle_deadline': 5}}
+
+    first = asyncio.run(fetcher.fetch_all_sources_async(config))
+    fetcher.cache.clear()
+    second = asyncio.run(fetcher.fetch_all_sources_async(config))
+
+    assert first['rss'][0]['full_text'] == 'Full story'
+    assert second['rss'][0]['full_text'] == 'Full story'
+    # Il testo completo è nel risultato in cache: nessun secondo download
+    assert len(local_site.hits('/fed')) == 1
+    assert fetcher.last_cycle_stats['http_cache']['not_modified'] == 1
+
+    # parse_seconds misura il parsing del feed, non il download dell'articolo (0.3s)
+    cached = fetcher.http_cache.get(local_site.url('/rss.xml'))
+    assert cached['parse_seconds'] < 0.3
+
+
+def test_sync_conditional_get_uses_configured_timeout(tmp_path, local_site):
+    local_site.routes = {'/news': {'body': HOMEPAGE, 'delay': 1.0}}
+    config = {'sentiment_sources': {'fetch': {'timeout': 0.3}}}
+    fetcher = SentimentFetcher(config, http_cache=HTTPCacheStore(tmp_path / 'http_cache.db'))
+
+    start = time.perf_counter()
+    assert fetcher.fetch_website_articles(local_site.url('/news')) == []
+    assert time.perf_counter() - start < 0.9
+    fetcher.http_cache.close()
@@ -0,0 +1,72 @@
+"""
+Max pain e muri su OptionChain colonnare confrontati con il calcolo originale per contratto
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.skew_analyzer import SkewAnalyzer
+from data.option_chain import OptionChain
+
+
+def reference_pain(calls, puts):
+    """Pain per strike come nel calcolo originale su liste di dict"""
+    strikes = set(c['strike'] for c in calls) | set(p['strike'] for p in puts)
+    return {
+        strike: sum(c['open_interest'] for c in calls if c['strike'] < strike) +
+                sum(p['open_interest'] for p in puts if p['strike'] > strike)
+        for strike in strikes
+    }
+
+
+def random_side(rng, strikes):
+    return pd.DataFrame({
+        'strike': strikes,
+        'openInterest': rng.integers(0, 20000, len(strikes)),
+        'volume': rng.integers(0, 5000, len(strikes)),
+        'impliedVolatility': rng.uniform(0.1, 0.6, len(strikes))
+    })
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_max_pain_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    grid = np.arange(350.0, 550.0, 2.5)
+    # Griglie diverse per call e put, strike ripetuti e ordine casuale
+    call_strikes = rng.permutation(np.concatenate([rng.choice(grid, 40, replace=False), rng.choice(grid, 3)]))
+    put_strikes = rng.permutation(rng.choice(grid, 50, replace=False))
+    chain = OptionChain(calls=random_side(rng, call_strikes), puts=random_side(rng, put_strikes),
+                        spot_price=450.0, expiration='2026-11-20', ticker='SPY')
+
+    legacy = chain.to_dict()
+    pain = reference_pain(legacy['calls'], legacy['puts'])
+    max_pain = SkewAnalyzer(chain).generate_option_walls()['max_pain']
+
+    # A parità di pain qualunque strike minimo è corretto
+    assert max_pain in pain
+    assert pain[max_pain] == min(pain.values())
+
+
+def test_walls_match_reference():
+    rng = np.random.default_rng(7)
+    strikes = np.arange(400.0, 500.0, 5.0)
+    chain = OptionChain(calls=random_side(rng, strikes), puts=random_side(rng, strikes),
+                        spot_price=450.0, expiration='2026-11-20', ticker='SPY')
+    legacy = chain.to_dict()
+
+    walls = SkewAnalyzer(chain).generate_option_walls(min_oi_threshold=0)
+    for key in ('calls', 'puts'):
+        expected = max(legacy[key], key=lambda c: c['open_interest'])
+        assert walls[key][0]['strike'] == expected['strike']
+        assert walls[key][0]['open_interest'] == expected['open_interest']
+        assert walls[key][0]['distance_points'] == pytest.approx(expected['strike'] - 450.0)
+
+    # Stesso risultato partendo dal dict legacy
+    assert SkewAnalyzer(legacy).generate_option_walls(min_oi_threshold=0) == walls
+
+
+def test_max_pain_needs_both_sides():
+    rng = np.random.default_rng(0)
+    chain = OptionChain(calls=random_side(rng, [440.0, 450.0]), puts=pd.DataFrame(),
+                        spot_price=450.0, expiration='2026-11-20', ticker='SPY')
+    assert SkewAnalyzer(chain).generate_option_walls()['max_pain'] == 0
@@ -0,0 +1,120 @@
+"""
+Fetch concorrente delle fonti sentiment contro un sito locale: deadline e risultati parziali
+"""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from data.http_cache import HTTPCacheStore
+from data.sentiment_fetcher import SentimentFetcher
+
+HOMEPAGE = b'''<html><body><main>
+<div class="story-card"><h2><a href="/news/1">Markets rally as VIX drops</a></h2>
+<p class="summary">Stocks climbed while options flow turned bullish.</p></div>
+<div class="story-card"><h2><a href="/news/2">Treasury yields slip after CPI</a></h2></div>
+</main></body></html>'''
+
+FEED = b'''<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title>
+<item><title>Fed holds rates</title><link>http://example.invalid/fed</link><guid>fed-1</guid>
+<description>Officials kept rates unchanged.</description>
+<content:encoded xmlns:content="http://purl.org/rss/1.0/modules/content/">Full story body</content:encoded>
+</item></channel></rss>'''
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = SentimentFetcher({}, http_cache=HTTPCacheStore(tmp_path / 'http_cache.db'))
+    yield fetcher
+    fetcher.http_cache.close()
+
+
+def sources(site):
+    return {
+        'websites': [
+            {'name': 'Fast', 'url': site.url('/news'), 'priority': 3},
+            {'name': 'Slow', 'url': site.url('/slow')}
+        ],
+        'rss_feeds': [{'name': 'Feed', 'url': site.url('/rss.xml')}],
+        'fetch': {'cycle_deadline': 0.5, 'timeout': 5}
+    }
+
+
+def test_deadline_returns_completed_sources(fetcher, local_site):
+    local_site.routes = {
+        '/news': {'body': HOMEPAGE},
+        '/slow': {'body': HOMEPAGE, 'delay': 3},
+        '/rss.xml': {'body': FEED, 'content_type': 'application/rss+xml'}
+    }
+
+    all_data = asyncio.run(fetcher.fetch_all_sources_async(sources(local_site)))
+    stats = fetcher.last_cycle_stats
+
+    # La fonte lenta viene cancellata, le altre arrivano comunque
+    assert stats['timed_out'] == ['Slow']
+    assert stats['completed'] == 2
+    assert stats['elapsed'] < 2
+    assert [a['title'] for a in all_data['websites']] == ['Markets rally as VIX drops', 'Treasury yields slip after CPI']
+    assert all(a['source_name'] == 'Fast' and a['priority'] == 3 for a in all_data['websites'])
+    assert [a['title'] for a in all_data['rss']] == ['Fed holds rates']
+    assert all_data['rss'][0]['content'] == 'Full story body'
+
+
+def test_failed_source_does_not_stop_cycle(fetcher, local_site):
+    local_site.routes = {
+        '/news': {'body': HOMEPAGE},
+        '/rss.xml': {'body': FEED, 'content_type': 'application/rss+xml'}
+    }  # /slow -> 404
+
+    all_data = asyncio.run(fetcher.fetch_all_sources_async(sources(local_site)))
+    stats = fetcher.last_cycle_stats
+
+    assert stats['failed'] == ['Slow']
+    assert stats['timed_out'] == []
+    assert len(all_data['websites']) == 2
+    assert len(all_data['rss']) == 1
+
+
+def test_rss_full_text_fetched_from_article(fetcher, local_site):
+    feed = FEED.replace(b'http://example.invalid/fed', local_site.url('/fed').encode())
+    feed = feed.replace(b'<content:encoded xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+                        b'Full story body</content:encoded>', b'')
+    local_site.routes = {
+        '/rss.xml': {'body': feed, 'content_type': 'application/rss+xml'},
+        '/fed': {'body': '<html><body><article><p>Il Consiglio</p><p>è unanime</p></article></body></html>'.encode(),
+                 'content_type': 'text/html; charset=utf-8'}
+    }
+
+    config = {'rss_feeds': [{'name': 'Feed', 'url': local_site.url('/rss.xml')}], 'fetch': {'cycle_deadline': 5}}
+    all_data = asyncio.run(fetcher.fetch_all_sources_async(config))
+
+    assert all_data['rss'][0]['full_text'] == 'Il Consiglio è unanime'
+
+
+class SlowTelegramFetcher(SentimentFetcher):
+    """Telegram con una chiamata sincrona lenta (come un client HTTP bloccante)"""
+
+    def _fetch_telegram_public(self, channel_username):
+        time.sleep(1.0)
+        return super()._fetch_telegram_public(channel_username)
+
+
+def test_sync_telegram_does_not_block_the_loop(tmp_path, local_site):
+    local_site.routes = {'/news': {'body': HOMEPAGE}}
+    fetcher = SlowTelegramFetcher({}, http_cache=HTTPCacheStore(tmp_path / 'http_cache.db'))
+    config = {
+        'websites': [{'name': 'Fast', 'url': local_site.url('/news')}],
+        'telegram_channels': [{'name': 'Slow', 'username': '@slow'}],
+        'fetch': {'cycle_deadline': 0.5}
+    }
+
+    all_data = asyncio.run(fetcher.fetch_all_sources_async(config))
+    stats = fetcher.last_cycle_stats
+    fetcher.http_cache.close()
+
+    # Il sito arriva e la deadline scade in tempo anche con Telegram ancora in corso
+    assert len(all_data['websites']) == 2
+    assert stats['timed_out'] == ['Slow']
+    assert stats['elapsed'] < 0.9
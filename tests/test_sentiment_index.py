@@ -0,0 +1,35 @@
+"""
+Indice sentiment per ticker: peso per rango della fonte e decadimento nel tempo
+"""
+import pytest
+
+from analysis.sentiment_index import SentimentIndex
+
+NOW = 1_800_000_000.0
+
+
+def test_priority_one_outweighs_priority_two():
+    index = SentimentIndex(half_life=3600)
+    index.update(0.8, ['SPY'], priority=1, timestamp=NOW)
+    index.update(-0.8, ['SPY'], priority=2, timestamp=NOW)
+
+    # Reuters/Bloomberg (priority 1) contano il doppio di MarketWatch/RSS (priority 2)
+    result = index.get('SPY', at=NOW)
+    assert result['final_score'] == pytest.approx(0.8 / 3)
+    assert result['weight'] == pytest.approx(1.5)
+
+
+def test_priority_weights_from_config():
+    config = {'analysis': {'sentiment': {'index': {'universe': ['SPY'], 'priority_weights': {1: 1.0, 2: 0.25}}}}}
+    index = SentimentIndex.from_config(config)
+    assert index.priority_weight(1) == 1.0
+    assert index.priority_weight(2) == 0.25
+    assert index.priority_weight(4) == pytest.approx(0.25)   # rango non in mappa: 1 / priority
+    assert index.priority_weight(None) == 1.0
+
+
+def test_weight_decays_with_half_life():
+    index = SentimentIndex(half_life=600)
+    index.update(0.5, ['SPY'], priority=1, timestamp=NOW)
+    assert index.get('SPY', at=NOW + 600)['weight'] == pytest.approx(0.5)
+    assert index.get('SPY', at=NOW + 600)['final_score'] == pytest.approx(0.5)
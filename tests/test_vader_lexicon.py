@@ -0,0 +1,22 @@
+"""
+Lessico VADER da file locale tramite il costruttore pubblico di vaderSentiment
+"""
+from analysis.sentiment_analyzer import _bundled_lexicon_path, _local_lexicon_vader
+
+
+def test_custom_lexicon_file(tmp_path):
+    lexicon = tmp_path / 'lexicon.txt'
+    lexicon.write_text("moon\t3.0\t0.5\t[3, 3, 3]\nrekt\t-3.0\t0.5\t[-3, -3, -3]\n", encoding='utf-8')
+
+    vader = _local_lexicon_vader(str(lexicon))
+    assert set(vader.lexicon) == {'moon', 'rekt'}
+    assert vader.polarity_scores('to the moon')['compound'] > 0.5
+    assert vader.polarity_scores('totally rekt')['compound'] < -0.5
+    # Parole assenti dal lessico locale: neutre
+    assert vader.polarity_scores('great rally')['compound'] == 0.0
+
+
+def test_bundled_lexicon():
+    vader = _local_lexicon_vader(_bundled_lexicon_path())
+    assert len(vader.lexicon) > 7000
+    assert vader.polarity_scores('Great rally, bullish!!')['compound'] > 0.5
@@ -0,0 +1,52 @@
+"""
+VIX come contesto di mercato: dati reali o segnaposto esplicito, mai valori costanti
+"""
+import pandas as pd
+import pytest
+
+from analysis.volatility_analyzer import VolatilityAnalyzer
+from data.options_fetcher import OptionsFetcher, fetch_vix_data, get_vix_context
+from data.providers import MarketDataProvider
+from utils.resilience import DataSourceError
+
+
+class HistoryProvider(MarketDataProvider):
+    """Provider con storico fisso per simbolo; i simboli assenti falliscono"""
+
+    def __init__(self, name, closes):
+        self.name = name
+        self.closes = closes
+
+    def get_history(self, symbol, period="5d"):
+        if symbol not in self.closes:
+            raise ConnectionError(f"{symbol} non raggiungibile")
+        return pd.DataFrame({'Close': self.closes[symbol]})
+
+
+def test_vix_failure_raises_and_is_marked_unavailable():
+    provider = HistoryProvider('vix-down', {})
+    with pytest.raises(DataSourceError):
+        fetch_vix_data(provider)
+
+    vix_data = get_vix_context(provider)
+    assert vix_data['available'] is False
+    assert 'current' not in vix_data
+
+    regime = VolatilityAnalyzer(vix_data, {}).analyze_volatility_regime(market_return=-1.5)
+    assert regime['regime'] == 'UNAVAILABLE'
+    assert regime['vix_current'] is None
+    assert regime['is_volatility_spiking'] is False
+
+
+def test_empty_vix_history_is_an_error():
+    with pytest.raises(DataSourceError):
+        fetch_vix_data(HistoryProvider('vix-empty', {'^VIX': []}))
+
+
+def test_non_spy_ticker_gets_market_vix():
+    provider = HistoryProvider('vix-up', {'^VIX': [15.0, 15.5, 16.0, 17.0, 21.0]})
+    vix_data = OptionsFetcher('QQQ', provider=provider)._fetch_vix_data()
+    assert vix_data == {'available': True, 'current': 21.0, 'previous': 17.0, 'week_ago': 15.0, 'change': 4.0}
+
+    regime = VolatilityAnalyzer(vix_data, {}).analyze_volatility_regime(market_return=-1.5)
+    assert regime['regime'] == 'PANIC'
@@ -46,7 +46,7 @@ class SignalGenerator:
             
             # Segnale da sentiment
             sentiment_score = sentiment_data.get('final_score', 0)
-            if abs(sentiment_score) > 0.5:  |Sentiment| > 0.5
+            if abs(sentiment_score) > 0.5:  # |Sentiment| > 0.5
                 direction = 'bearish' if sentiment_score < 0 else 'bullish'
                 signals.append({
                     'type': 'sentiment_extreme',
@@ -5,7 +5,7 @@ Funzioni helper utili
 import yaml
 import json
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import pandas as pd
 
 def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
@@ -27,6 +27,17 @@ def save_config(config: Dict[str, Any], config_path: str = "config.yaml"):
         print(f"❌ Errore salvataggio config: {e}")
         return False
 
+def get_asset_universe(config: Dict[str, Any]) -> List[str]:
+    """Lista ticker da config: primario, secondari e watchlist (senza duplicati)"""
+    assets = config.get('assets', {}) or {}
+    tickers = [assets.get('primary')] + list(assets.get('secondaries') or []) + list(assets.get('watchlist') or [])
+    
+    universe = []
+    for ticker in tickers:
+        if ticker and ticker not in universe:
+            universe.append(ticker)
+    return universe
+
 def format_price(price: float) -> str:
     """Formatta prezzo in stringa"""
     if price >= 1000:
@@ -0,0 +1,242 @@
+"""
+Rate limiting, retry con backoff e circuit breaker per le fonti dati
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+import logging
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class DataSourceError(Exception):
+    """Errore esplicito di una fonte dati (niente fallback silenziosi)"""
+
+    def __init__(self, source: str, message: str):
+        super().__init__(f"[{source}] {message}")
+        self.source = source
+
+
+class RateLimitedError(DataSourceError):
+    """La fonte ha risposto con throttling (es. HTTP 429)"""
+
+
+class CircuitOpenError(DataSourceError):
+    """Circuit breaker aperto: la fonte non viene interrogata"""
+
+
+class TokenBucket:
+    """Token bucket thread-safe: rate token/secondo, burst massimo capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Attende un token; False se non disponibile entro timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = time.monotonic()
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.acquired += 1
+                    self.wait_seconds += now - start
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per fonte: dopo failure_threshold errori consecutivi si
+    apre per reset_timeout secondi, poi lascia passare una sola chiamata di
+    prova; le altre vengono respinte finché la prova non termina
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, "circuit breaker aperto, fonte sospesa")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, "circuit breaker semi-aperto, prova in corso")
+                self._probe_in_flight = True
+
+    def after_call(self):
+        """Fine della chiamata (anche con errori non registrati): libera la prova"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"⚠️ Circuit breaker {self.name} aperto dopo {self.failures} errori")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Backoff esponenziale con full jitter"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+# Errori transitori (rete, I/O, throttling segnalato dalla fonte): gli altri
+# sono bug o dati non validi e vengono propagati senza retry
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (requests.RequestException, OSError, DataSourceError)
+
+
+class SourceGuard:
+    """Rate limiter + retry con backoff + circuit breaker per una fonte dati"""
+
+    def __init__(self, name: str, requests_per_second: float = 2.0, burst: Optional[float] = None,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 failure_threshold: int = 5, reset_timeout: float = 60.0,
+                 retry_on: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+                 no_retry_on: Tuple[Type[BaseException], ...] = (LookupError,)):
+        self.name = name
+        self.limiter = TokenBucket(requests_per_second, burst)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.no_retry_on = no_retry_on
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Esegue func rispettando limiter, retry e circuit breaker"""
+        self.breaker.before_call()
+        try:
+            return self._call(func, *args, **kwargs)
+        finally:
+            self.breaker.after_call()
+
+    def _call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self.calls += 1
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except self.retry_on as e:
+                last_error = e
+                if isinstance(e, self.no_retry_on):
+                    # Errore non transitorio (es. dato inesistente): inutile ritentare
+                    break
+                if attempt < self.max_retries:
+                    with self._lock:
+                        self.retries += 1
+                    delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                    logger.debug(f"Retry {attempt + 1}/{self.max_retries} su {self.name} tra {delay:.2f}s: {e}")
+                    time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+        with self._lock:
+            self.failures += 1
+        if not isinstance(last_error, self.no_retry_on):
+            self.breaker.record_failure()
+        raise DataSourceError(self.name, f"fallito dopo {attempt + 1} tentativi: {last_error}") from last_error
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'source': self.name,
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'circuit_state': self.breaker.state,
+            'circuit_rejected': self.breaker.rejected,
+            'rate_limit_wait_seconds': round(self.limiter.wait_seconds, 3)
+        }
+
+
+_guards: Dict[str, SourceGuard] = {}
+_guard_settings: Dict[str, Dict[str, Any]] = {}
+_guards_lock = threading.Lock()
+
+
+def get_source_guard(name: str, **settings) -> SourceGuard:
+    """
+    SourceGuard condiviso dal processo per la fonte name. Senza settings
+    restituisce quello esistente (o uno con i default); con settings diversi
+    da quelli correnti lo ricostruisce, così la configurazione letta da
+    config.yaml prevale su un guard creato prima con i default
+    """
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None or (settings and settings != _guard_settings.get(name)):
+            if guard is not None:
+                logger.info(f"🔧 SourceGuard {name} ricostruito con {settings}")
+            guard = SourceGuard(name, **settings)
+            _guards[name] = guard
+            _guard_settings[name] = dict(settings)
+        return guard
+
+
+def guard_settings_from_config(source_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Parametri SourceGuard dalle sezioni rate_limit/retry/circuit_breaker di config.yaml"""
+    rate_limit = source_config.get('rate_limit', {}) or {}
+    retry = source_config.get('retry', {}) or {}
+    breaker = source_config.get('circuit_breaker', {}) or {}
+    settings = {
+        'requests_per_second': rate_limit.get('requests_per_second'),
+        'burst': rate_limit.get('burst'),
+        'max_retries': retry.get('max_retries'),
+        'base_delay': retry.get('base_delay'),
+        'max_delay': retry.get('max_delay'),
+        'failure_threshold': breaker.get('failure_threshold'),
+        'reset_timeout': breaker.get('reset_timeout')
+    }
+    return {key: value for key, value in settings.items() if value is not None}